@@ -0,0 +1,117 @@
+import time
+from contextlib import ExitStack
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import AccountRemoval, ArchivedPost, Like, Posts, User
+from .sharding import post_databases
+
+
+def request_account_removal(user):
+    """Deactivates the account now and queues its content for chunked cleanup.
+
+    Posts already render as "user removed" once the user is inactive, so the
+    expensive work can run later in small batches.
+    """
+    with transaction.atomic():
+        user.is_active = False
+        user.set_unusable_password()
+        user.save(update_fields=["is_active", "password"])
+        job, _ = AccountRemoval.objects.get_or_create(user=user)
+    return job
+
+
+def remove_likes(user_id, batch_size):
+    removed = 0
+    for alias in post_databases():
+        likes = Like.objects.using(alias)
+        ids = list(
+            likes.filter(user_id=user_id).values_list("pk", flat=True)[: batch_size - removed]
+        )
+        likes.filter(pk__in=ids).delete()
+        removed += len(ids)
+        if removed >= batch_size:
+            break
+    return removed
+
+
+def remove_follows(user_id, batch_size):
+    Follow = User.followers.through
+    ids = list(
+        Follow.objects.filter(Q(from_user_id=user_id) | Q(to_user_id=user_id))
+        .values_list("pk", flat=True)[:batch_size]
+    )
+    Follow.objects.filter(pk__in=ids).delete()
+    return len(ids)
+
+
+def anonymize_posts(user_id, batch_size):
+    updated = 0
+    for alias in post_databases():
+        posts = Posts.objects.using(alias)
+        ids = list(
+            posts.filter(user_id=user_id).values_list("pk", flat=True)[: batch_size - updated]
+        )
+        updated += posts.filter(pk__in=ids).update(user=None)
+        if updated >= batch_size:
+            break
+    return updated
+
+
+def anonymize_archived_posts(user_id, batch_size):
+    updated = 0
+    for alias in post_databases():
+        posts = ArchivedPost.objects.using(alias)
+        ids = list(
+            posts.filter(user_id=user_id).values_list("pk", flat=True)[: batch_size - updated]
+        )
+        updated += posts.filter(pk__in=ids).update(user=None)
+        if updated >= batch_size:
+            break
+    return updated
+
+
+STAGE_HANDLERS = {
+    "likes": remove_likes,
+    "follows": remove_follows,
+    "posts": anonymize_posts,
+    "archive": anonymize_archived_posts,
+}
+
+
+def run_batch(job, batch_size):
+    """Processes one batch and saves the checkpoint in short per-database transactions.
+
+    With sharding on, the batch's writes on each shard commit just before the
+    checkpoint on "default", so a crash in between can only leave the
+    checkpoint behind. That is safe: each stage selects what is left for the
+    user, so an interrupted job resumes where it stopped. Returns False once
+    the job is done.
+    """
+    if job.stage == "done":
+        return False
+
+    with ExitStack() as transactions:
+        for alias in dict.fromkeys([DEFAULT_DB_ALIAS, *post_databases()]):
+            transactions.enter_context(transaction.atomic(using=alias))
+        count = STAGE_HANDLERS[job.stage](job.user_id, batch_size)
+        job.processed += count
+        if count < batch_size:
+            job.stage = AccountRemoval.STAGES[AccountRemoval.STAGES.index(job.stage) + 1]
+            if job.stage == "done":
+                job.completed_at = timezone.now()
+        job.save()
+    return job.stage != "done"
+
+
+def run_account_removal(job, batch_size=500, pause=0.0, max_batches=None):
+    batches = 0
+    while run_batch(job, batch_size):
+        batches += 1
+        if max_batches and batches >= max_batches:
+            break
+        if pause:
+            time.sleep(pause)
+    return job
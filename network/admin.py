@@ -1,8 +1,164 @@
+from datetime import datetime
+
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections, models
+from django.db.models import Max, Min, Q
+from django.utils import timezone
+from django.utils.functional import cached_property
 
 from network.models import Like, Posts, User
 
-# Register your models here.
-admin.site.register(User)
-admin.site.register(Posts)
-admin.site.register(Like)
+
+class EstimatedCountPaginator(Paginator):
+    """Uses the planner's row estimate for unfiltered changelists instead of COUNT(*)."""
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = self.estimate_rows(queryset)
+            if estimate is not None:
+                return estimate
+        return super().count
+
+    def estimate_rows(self, queryset):
+        connection = connections[queryset.db]
+        table = queryset.model._meta.db_table
+        queries = {
+            "sqlite": "SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1",
+            "postgresql": "SELECT reltuples::bigint FROM pg_class WHERE relname = %s",
+        }
+        sql = queries.get(connection.vendor)
+        if sql is None:
+            return None
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(sql, [table])
+                row = cursor.fetchone()
+        except DatabaseError:
+            return None
+        if not row:
+            return None
+        # sqlite_stat1 rows start with the number of rows in the table (kept by ANALYZE)
+        estimate = int(str(row[0]).split()[0])
+        return estimate if estimate >= 0 else None
+
+
+class IndexedDrilldownQuerySet(models.QuerySet):
+    """Answers the admin date hierarchy with index range probes.
+
+    `QuerySet.datetimes()` runs SELECT DISTINCT over a date function, which scans
+    every row. Here each candidate year/month/day between the indexed MIN and MAX
+    is probed with an EXISTS on its range instead.
+    """
+
+    def datetimes(self, field_name, kind, order="ASC", tzinfo=None, **kwargs):
+        if kind not in ("year", "month", "day"):
+            return super().datetimes(field_name, kind, order, tzinfo, **kwargs)
+
+        bounds = self.aggregate(first=Min(field_name), last=Max(field_name))
+        if bounds["first"] is None:
+            return []
+        first = timezone.localtime(bounds["first"], tzinfo)
+        last = timezone.localtime(bounds["last"], tzinfo)
+
+        periods = []
+        start = self.period_start(first, kind)
+        while start <= last:
+            end = self.next_period(start, kind)
+            if self.filter(**{f"{field_name}__gte": start, f"{field_name}__lt": end}).exists():
+                periods.append(start)
+            start = end
+        return periods[::-1] if order == "DESC" else periods
+
+    @staticmethod
+    def period_start(moment, kind):
+        parts = {"year": (moment.year, 1, 1), "month": (moment.year, moment.month, 1)}
+        values = parts.get(kind, (moment.year, moment.month, moment.day))
+        return timezone.make_aware(datetime(*values), moment.tzinfo)
+
+    @staticmethod
+    def next_period(start, kind):
+        if kind == "year":
+            values = (start.year + 1, 1, 1)
+        elif kind == "month":
+            values = (start.year + start.month // 12, start.month % 12 + 1, 1)
+        else:
+            following = start.date().toordinal() + 1
+            following = datetime.fromordinal(following)
+            values = (following.year, following.month, following.day)
+        return timezone.make_aware(datetime(*values), start.tzinfo)
+
+
+class IndexedSearchMixin:
+    """Turns search terms into exact or prefix range lookups that use an index.
+
+    `indexed_search_fields` maps a field to "exact", "prefix" or "id"; "id"
+    fields only match numeric terms.
+    """
+
+    indexed_search_fields = {}
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+
+        condition = Q()
+        for field, mode in self.indexed_search_fields.items():
+            if mode == "id":
+                if term.isdigit():
+                    condition |= Q(**{field: int(term)})
+            elif mode == "prefix":
+                condition |= Q(**{f"{field}__gte": term, f"{field}__lt": term + "\uffff"})
+            else:
+                condition |= Q(**{field: term})
+        return queryset.filter(condition), False
+
+
+class NetworkModelAdmin(IndexedSearchMixin, admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+
+
+@admin.register(User)
+class UserAdmin(NetworkModelAdmin):
+    list_display = ("id", "username", "email", "is_active", "is_staff", "date_joined")
+    search_fields = ("username",)
+    indexed_search_fields = {"username": "prefix", "id": "id"}
+    raw_id_fields = ("followers",)
+    ordering = ("-id",)
+
+
+@admin.register(Posts)
+class PostsAdmin(NetworkModelAdmin):
+    list_display = ("id", "user", "excerpt", "parent_id", "timestamp")
+    list_select_related = ("user",)
+    search_fields = ("user__username",)
+    indexed_search_fields = {"user__username": "exact", "id": "id"}
+    autocomplete_fields = ("user",)
+    raw_id_fields = ("parent",)
+    date_hierarchy = "timestamp"
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        return IndexedDrilldownQuerySet(
+            model=queryset.model, query=queryset.query, using=queryset._db
+        )
+
+    @admin.display(description="Body")
+    def excerpt(self, post):
+        return post.body if len(post.body) <= 80 else f"{post.body[:77]}..."
+
+
+@admin.register(Like)
+class LikeAdmin(NetworkModelAdmin):
+    list_display = ("id", "user", "post_id")
+    list_select_related = ("user",)
+    search_fields = ("user__username",)
+    indexed_search_fields = {"user__username": "exact", "post_id": "id"}
+    autocomplete_fields = ("user",)
+    raw_id_fields = ("post",)
+    ordering = ("-id",)
@@ -0,0 +1,103 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import ArchivedPost, Posts
+from .sharding import ShardedQuerySet, post_databases, sharded, thread_ids, user_posts
+
+
+def archive_cutoff(now=None):
+    days = getattr(settings, "ARCHIVE_AFTER_DAYS", 180)
+    return (now or timezone.now()) - timedelta(days=days)
+
+
+def archive_threads(alias, root_ids, cutoff):
+    """Moves the given threads into the archive unless any post in them is newer than `cutoff`.
+
+    Returns the number of posts archived. Rows are copied with their like
+    counts folded in, then the hot rows are deleted, which also drops their
+    likes, tag and mention rows and trending scores.
+    """
+    ids = thread_ids(alias, root_ids)
+    rows = {
+        row["id"]: row
+        for row in Posts.objects.using(alias)
+        .filter(id__in=ids)
+        .annotate(like_count=Count("liked_by"))
+        .values("id", "user_id", "body", "timestamp", "parent_id", "like_count")
+    }
+
+    # thread_ids lists parents before their replies
+    root_of = {}
+    for post_id in ids:
+        parent_id = rows[post_id]["parent_id"]
+        root_of[post_id] = post_id if parent_id is None else root_of[parent_id]
+    live = {root_of[post_id] for post_id in ids if rows[post_id]["timestamp"] >= cutoff}
+
+    archived = [
+        ArchivedPost(
+            id=row["id"],
+            user_id=row["user_id"],
+            body=row["body"],
+            timestamp=row["timestamp"],
+            parent_id=row["parent_id"],
+            likes=row["like_count"],
+        )
+        for post_id, row in rows.items()
+        if root_of[post_id] not in live
+    ]
+    with transaction.atomic(using=alias):
+        ArchivedPost.objects.using(alias).bulk_create(archived, ignore_conflicts=True)
+        Posts.objects.using(alias).filter(
+            id__in=[root_id for root_id in root_ids if root_id not in live]
+        ).delete()
+    return len(archived)
+
+
+def archive_old_posts(now=None, batch_size=200):
+    """Archives every thread whose posts are all older than ARCHIVE_AFTER_DAYS.
+
+    Works through top-level posts in id order, one short transaction per
+    batch, so it can run alongside normal traffic and be resumed at any time.
+    """
+    cutoff = archive_cutoff(now)
+    archived = 0
+    for alias in post_databases():
+        last_id = 0
+        while True:
+            root_ids = list(
+                Posts.objects.using(alias)
+                .filter(parent__isnull=True, timestamp__lt=cutoff, id__gt=last_id)
+                .order_by("id")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not root_ids:
+                break
+            last_id = root_ids[-1]
+            archived += archive_threads(alias, root_ids, cutoff)
+    return archived
+
+
+def find_archived_post(post_id):
+    for alias in post_databases():
+        post = ArchivedPost.objects.using(alias).filter(id=post_id).first()
+        if post is not None:
+            return post
+    return None
+
+
+def profile_posts(user):
+    """The user's hot and archived posts, newest first.
+
+    Users with nothing archived get the plain hot queryset, so their profile
+    pages keep a COUNT and an OFFSET read per post database. With sharding on
+    that is every shard, since comments live on other authors' shards, plus
+    an `exists()` per shard for the archive check.
+    """
+    archived = sharded(ArchivedPost.objects.filter(user=user))
+    if not archived.exists():
+        return user_posts(user)
+    return ShardedQuerySet([user_posts(user), archived])
@@ -0,0 +1,71 @@
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.http import FileResponse, Http404, HttpResponseNotAllowed, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "public, max-age=0, must-revalidate"
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+
+
+def accepts(request, encoding):
+    return re.search(rf"\b{encoding}\b", request.headers.get("Accept-Encoding", ""))
+
+
+def hashed_names(storage):
+    """The fingerprinted names in `storage`'s manifest, built once per manifest load."""
+    hashed_files = getattr(storage, "hashed_files", {})
+    cached = getattr(storage, "_hashed_names", None)
+    if cached is None or cached[0] is not hashed_files:
+        cached = (hashed_files, frozenset(hashed_files.values()))
+        storage._hashed_names = cached
+    return cached[1]
+
+
+def is_hashed(path):
+    return path in hashed_names(staticfiles_storage)
+
+
+def serve_asset(request, path):
+    """Serves collected static files with long-lived caching.
+
+    Fingerprinted names from the manifest never change, so they are marked
+    immutable; anything else must revalidate. Precompressed variants written by
+    `CompressedManifestStaticFilesStorage` are picked by Accept-Encoding.
+    """
+    if request.method not in ("GET", "HEAD"):
+        return HttpResponseNotAllowed(["GET", "HEAD"])
+
+    try:
+        full_path = safe_join(settings.STATIC_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404("Asset not found.")
+    if not os.path.isfile(full_path):
+        raise Http404("Asset not found.")
+
+    stat = os.stat(full_path)
+    if not was_modified_since(request.headers.get("If-Modified-Since"), stat.st_mtime):
+        response = HttpResponseNotModified()
+    else:
+        content_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+        encoding, served_path = None, full_path
+        for name, extension in ENCODINGS:
+            if accepts(request, name) and os.path.isfile(full_path + extension):
+                encoding, served_path = name, full_path + extension
+                break
+
+        response = FileResponse(open(served_path, "rb"), content_type=content_type)
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+        response.headers["Last-Modified"] = http_date(stat.st_mtime)
+
+    response.headers["Cache-Control"] = IMMUTABLE if is_hashed(path) else REVALIDATE
+    response.headers["Vary"] = "Accept-Encoding"
+    return response
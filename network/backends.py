@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+
+def user_cache_key(user_id):
+    return f"network:user:{user_id}"
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend that serves the session user from the cache.
+
+    `AuthenticationMiddleware` resolves `request.user` through `get_user` on every
+    authenticated request; caching it removes the user-table read. Entries are
+    dropped whenever the user row is saved or deleted (see `network.signals`),
+    and the session hash is still verified against the cached password hash.
+    """
+
+    def get_user(self, user_id):
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, getattr(settings, "USER_CACHE_TIMEOUT", 60))
+        return user if self.user_can_authenticate(user) else None
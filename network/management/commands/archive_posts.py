@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from network.archive import archive_old_posts
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves threads older than ARCHIVE_AFTER_DAYS out of the hot post tables "
+        "into the archive, folding their likes into counts."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=200)
+
+    def handle(self, *args, **options):
+        archived = archive_old_posts(batch_size=options["batch_size"])
+        self.stdout.write(f"Archived {archived} posts.")
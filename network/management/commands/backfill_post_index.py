@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from network.models import Posts
+from network.sharding import post_databases
+from network.tags import index_posts
+
+
+class Command(BaseCommand):
+    help = (
+        "Extracts #tags and @mentions of existing posts into the index tables, "
+        "in chunks, on every post database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--database",
+            choices=post_databases(),
+            help="Only backfill this post database (to resume one that was interrupted).",
+        )
+        parser.add_argument(
+            "--start-after",
+            type=int,
+            default=0,
+            help="Resume after this post id (printed as progress by earlier runs, with its database).",
+        )
+
+    def handle(self, *args, **options):
+        aliases = [options["database"]] if options["database"] else post_databases()
+        # Ids interleave across shards, so a resume point only means something on one of them
+        if options["start_after"] and len(aliases) > 1:
+            raise CommandError("--start-after needs --database when posts are sharded.")
+        for alias in aliases:
+            last_id = options["start_after"]
+            while True:
+                batch = list(
+                    Posts.objects.using(alias)
+                    .filter(id__gt=last_id)
+                    .order_by("id")
+                    .only("id", "body", "timestamp")[: options["batch_size"]]
+                )
+                if not batch:
+                    break
+                tags, mentions = index_posts(batch)
+                last_id = batch[-1].id
+                self.stdout.write(
+                    f"[{alias}] Indexed posts up to id {last_id}: "
+                    f"{tags} tags, {mentions} mentions."
+                )
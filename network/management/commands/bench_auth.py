@@ -0,0 +1,70 @@
+import statistics
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from network.backends import user_cache_key
+from network.models import User
+
+CONFIGURATIONS = [
+    (
+        "db sessions",
+        {
+            "SESSION_ENGINE": "django.contrib.sessions.backends.db",
+            "AUTHENTICATION_BACKENDS": ["django.contrib.auth.backends.ModelBackend"],
+        },
+    ),
+    ("signed cookie + cached user", {}),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares queries and latency of an authenticated API request between "
+        "database-backed sessions and the signed-cookie/cached-user setup."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("username", help="User to authenticate as.")
+        parser.add_argument("--path", default="/posts/all")
+        parser.add_argument("--requests", type=int, default=50)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['username']!r} does not exist.")
+
+        results = []
+        for label, overrides in CONFIGURATIONS:
+            with override_settings(**overrides):
+                queries, timings = self.measure(user, options["path"], options["requests"])
+            results.append(queries)
+            self.stdout.write(
+                f"{label:<30} {queries:6.1f} queries/request  "
+                f"median {statistics.median(timings):7.2f} ms  "
+                f"max {max(timings):7.2f} ms"
+            )
+
+        self.stdout.write(f"Saved {results[0] - results[-1]:.1f} queries per request.")
+
+    def measure(self, user, path, requests):
+        client = Client()
+        client.force_login(user)
+        cache.delete(user_cache_key(user.pk))
+        client.get(path)
+
+        query_counts, timings = [], []
+        for _ in range(requests):
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                response = client.get(path)
+                timings.append((time.perf_counter() - start) * 1000)
+            if response.status_code != 200:
+                raise CommandError(f"GET {path} returned {response.status_code}.")
+            query_counts.append(len(context.captured_queries))
+        return statistics.mean(query_counts), timings
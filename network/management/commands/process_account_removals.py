@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from network.account_removal import run_account_removal
+from network.models import AccountRemoval
+
+
+class Command(BaseCommand):
+    help = "Anonymizes posts and deletes likes and follows of removed accounts in small batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0.05,
+            help="Seconds to sleep between batches so other writers get the lock.",
+        )
+        parser.add_argument("--max-batches", type=int, default=None)
+
+    def handle(self, *args, **options):
+        pending = AccountRemoval.objects.exclude(stage="done").order_by("requested_at")
+        for job in pending.iterator():
+            run_account_removal(
+                job,
+                batch_size=options["batch_size"],
+                pause=options["pause"],
+                max_batches=options["max_batches"],
+            )
+            self.stdout.write(
+                f"User {job.user_id}: stage {job.stage}, {job.processed} rows processed."
+            )
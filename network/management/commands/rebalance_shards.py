@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from network.sharding import rebalance, sharding_enabled
+
+
+class Command(BaseCommand):
+    help = (
+        "Copies users to every shard and moves each thread onto its author's shard. "
+        "Run after enabling sharding or changing the number of shards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=200)
+
+    def handle(self, *args, **options):
+        if not sharding_enabled():
+            raise CommandError("Sharding is disabled; set NETWORK_SHARD_COUNT first.")
+        moved = rebalance(batch_size=options["batch_size"])
+        self.stdout.write(f"Moved {moved} posts.")
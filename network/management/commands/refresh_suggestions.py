@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from network.suggestions import refresh_suggestions
+
+
+class Command(BaseCommand):
+    help = "Recomputes friends-of-friends follow suggestions served by /users/suggestions."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top-k", type=int, default=10)
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        stored = refresh_suggestions(
+            top_k=options["top_k"], batch_size=options["batch_size"]
+        )
+        self.stdout.write(f"Stored {stored} follow suggestions.")
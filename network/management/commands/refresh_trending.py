@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from network.trending import refresh_trending_scores
+
+
+class Command(BaseCommand):
+    help = "Recomputes the time-decayed trending ranking served by /posts/trending."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=0,
+            help="Keep running and refresh every INTERVAL seconds.",
+        )
+
+    def handle(self, *args, **options):
+        interval = options["interval"]
+        while True:
+            ranked = refresh_trending_scores()
+            self.stdout.write(f"Ranked {ranked} trending posts.")
+            if not interval:
+                break
+            time.sleep(interval)
@@ -0,0 +1,68 @@
+import os
+import pstats
+from collections import Counter
+from io import StringIO
+
+from django.core.management.base import BaseCommand, CommandError
+
+from network.profiling import load_profiles, profile_setting
+
+SORT_KEYS = {
+    "ms": lambda summary: summary["ms"],
+    "sql_ms": lambda summary: summary["sql_ms"],
+    "queries": lambda summary: len(summary["queries"]),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Lists the slowest captured request profiles, or summarizes one of them "
+        "(hottest functions, slowest and most repeated SQL) when given its id."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("profile_id", nargs="?", help="Profile to summarize.")
+        parser.add_argument("--sort", choices=SORT_KEYS, default="ms")
+        parser.add_argument("--limit", type=int, default=10)
+
+    def handle(self, *args, **options):
+        summaries = load_profiles()
+        if options["profile_id"]:
+            matches = [s for s in summaries if s["id"] == options["profile_id"]]
+            if not matches:
+                raise CommandError(f"Profile {options['profile_id']!r} does not exist.")
+            self.describe(matches[0], options["limit"])
+            return
+
+        summaries.sort(key=SORT_KEYS[options["sort"]], reverse=True)
+        for summary in summaries[: options["limit"]]:
+            self.stdout.write(
+                f"{summary['id']}  {summary['ms']:8.1f} ms  "
+                f"{len(summary['queries']):4} queries {summary['sql_ms']:8.1f} ms  "
+                f"{summary['status']} {summary['method']} {summary['path']}"
+            )
+
+    def describe(self, summary, limit):
+        self.stdout.write(
+            f"{summary['method']} {summary['path']} -> {summary['status']} "
+            f"in {summary['ms']:.1f} ms, {len(summary['queries'])} queries "
+            f"taking {summary['sql_ms']:.1f} ms"
+        )
+
+        self.stdout.write("\nSlowest queries:")
+        slowest = sorted(summary["queries"], key=lambda query: query["ms"], reverse=True)
+        for query in slowest[:limit]:
+            self.stdout.write(f"{query['ms']:8.2f} ms  [{query['database']}] {query['sql']}")
+
+        repeated = Counter(query["sql"] for query in summary["queries"])
+        repeated = [(sql, count) for sql, count in repeated.most_common(limit) if count > 1]
+        if repeated:
+            self.stdout.write("\nRepeated queries:")
+            for sql, count in repeated:
+                self.stdout.write(f"{count:6}x  {sql}")
+
+        self.stdout.write("\nHottest functions:")
+        path = os.path.join(profile_setting("DIR", "profiles"), f"{summary['id']}.prof")
+        output = StringIO()
+        pstats.Stats(path, stream=output).sort_stats("cumulative").print_stats(limit)
+        self.stdout.write(output.getvalue())
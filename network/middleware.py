@@ -0,0 +1,117 @@
+import cProfile
+import re
+import time
+
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+
+from .notifications import batched_notifications
+from .profiling import QueryRecorder, save_profile, should_profile
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+re_accepts_brotli = re.compile(r"\bbr\b")
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """GZipMiddleware that prefers brotli for JSON when it is installed and accepted.
+
+    Brotli output has no room for GZipMiddleware's random padding (its BREACH
+    mitigation), so pages that may embed the CSRF token (HTML forms and the
+    like) are left to gzip; only JSON API responses use brotli.
+
+    Streaming responses are compressed chunk by chunk, flushing after each one
+    so clients can start parsing before the response is complete.
+    """
+
+    brotli_quality = 5
+
+    def process_response(self, request, response):
+        accepts_brotli = re_accepts_brotli.search(
+            request.META.get("HTTP_ACCEPT_ENCODING", "")
+        )
+        if (
+            brotli is None
+            or not accepts_brotli
+            or not response.get("Content-Type", "").startswith("application/json")
+            or response.has_header("Content-Encoding")
+            or getattr(response, "is_async", False)
+        ):
+            return super().process_response(request, response)
+
+        if not response.streaming and len(response.content) < 200:
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        if response.streaming:
+            response.streaming_content = self.compress_sequence(response.streaming_content)
+            del response.headers["Content-Length"]
+        else:
+            compressed = brotli.compress(response.content, quality=self.brotli_quality)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers["Content-Length"] = str(len(compressed))
+
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        response.headers["Content-Encoding"] = "br"
+        return response
+
+    def compress_sequence(self, sequence):
+        compressor = brotli.Compressor(quality=self.brotli_quality)
+        for chunk in sequence:
+            data = compressor.process(chunk) + compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+
+
+class SamplingProfilerMiddleware:
+    """Profiles sampled or explicitly requested requests (see network.profiling).
+
+    Most requests only pay for one random draw. A captured request runs under
+    cProfile with its SQL recorded, and its id is returned in `X-Profile-Id`
+    for `manage.py show_profiles`.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not should_profile(request):
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        with recorder.recording():
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+        duration_ms = (time.perf_counter() - start) * 1000
+        response.headers["X-Profile-Id"] = save_profile(
+            profiler, request, response, duration_ms, recorder.queries
+        )
+        return response
+
+
+class NotificationBatchMiddleware:
+    """Writes the notifications a request raised in one batch after the view returns.
+
+    Batches are per request, not across requests: a like or follow raises a
+    single event, and coalescing happens against unread rows in the database.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with batched_notifications():
+            return self.get_response(request)
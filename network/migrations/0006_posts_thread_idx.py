@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('network', '0005_trendingscore'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='posts',
+            index=models.Index(fields=['parent', '-timestamp', '-id'], name='posts_thread_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:42
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('network', '0006_posts_thread_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountRemoval',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stage', models.CharField(default='likes', max_length=16)),
+                ('processed', models.PositiveIntegerField(default=0)),
+                ('requested_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='removal', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('network', '0011_posts_user_feed_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostSequence',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+            ],
+        ),
+    ]
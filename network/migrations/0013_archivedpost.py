@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('network', '0012_postsequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedPost',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('body', models.TextField()),
+                ('timestamp', models.DateTimeField()),
+                ('parent_id', models.BigIntegerField(blank=True, null=True)),
+                ('likes', models.PositiveIntegerField(default=0)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_posts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', '-timestamp', '-id'], name='archive_user_feed_idx'), models.Index(fields=['parent_id', '-timestamp', '-id'], name='archive_thread_idx')],
+            },
+        ),
+    ]
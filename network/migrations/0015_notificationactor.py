@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 20:24
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def record_last_actors(apps, schema_editor):
+    Notification = apps.get_model("network", "Notification")
+    NotificationActor = apps.get_model("network", "NotificationActor")
+    NotificationActor.objects.bulk_create(
+        NotificationActor(notification_id=notification_id, actor_id=actor_id)
+        for notification_id, actor_id in Notification.objects.filter(
+            last_actor__isnull=False
+        ).values_list("id", "last_actor_id").iterator()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('network', '0014_notifications'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationActor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('actor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('notification', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='actors', to='network.notification')),
+            ],
+            options={
+                'unique_together': {('notification', 'actor')},
+            },
+        ),
+        migrations.RunPython(record_last_actors, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,16 @@
+from django.conf import settings
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import DEFAULT_DB_ALIAS, models
+from django.db.models import Count, F, Window, prefetch_related_objects
+from django.db.models.functions import RowNumber
+
+
+def by_database(instances):
+    """Groups instances by the database they were loaded from (see network.sharding)."""
+    groups = {}
+    for instance in instances:
+        groups.setdefault(instance._state.db or DEFAULT_DB_ALIAS, []).append(instance)
+    return groups
 
 
 class User(AbstractUser):
@@ -7,16 +18,38 @@ class User(AbstractUser):
         "self", symmetrical=False, related_name="following"
     )
 
-    def serialize(self):
+    SERIALIZED_FIELDS = (
+        "username", "followers", "followers_count", "following", "following_count"
+    )
+
+    def serialize(self, fields=None):
+        """`fields` limits the output (and the queries run) to those keys."""
+        serializers = {
+            "username": lambda: self.username,
+            "followers": lambda: [f.username for f in self.followers.all()],
+            "followers_count": lambda: self.followers.count(),
+            "following": lambda: [f.username for f in self.following.all()],
+            "following_count": lambda: self.following.count(),
+        }
         return {
-            "username": self.username,
-            "followers": [f.username for f in self.followers.all()],
-            "followers_count": self.followers.count(),
-            "following": [f.username for f in self.following.all()],
-            "following_count": self.following.count(),
+            name: value()
+            for name, value in serializers.items()
+            if fields is None or name in fields
         }
 
 
+class PostsQuerySet(models.QuerySet):
+    def create(self, **kwargs):
+        """Saves without a fixed database unless `using()` picked one.
+
+        That lets the router place the post by its author or parent (see
+        network.sharding) instead of the model-wide default.
+        """
+        post = self.model(**kwargs)
+        post.save(force_insert=True, using=self._db)
+        return post
+
+
 class Posts(models.Model):
     user = models.ForeignKey(
         "User", on_delete=models.SET_NULL, null=True, related_name="posts"
@@ -27,36 +60,208 @@ class Posts(models.Model):
         "self", null=True, blank=True, on_delete=models.CASCADE, related_name="comments"
     )
 
+    objects = PostsQuerySet.as_manager()
+
+    SERIALIZED_FIELDS = (
+        "id", "user", "body", "likes", "timestamp", "comments", "comments_count", "liked"
+    )
+
     def get_display_user(self, user):
         return user.username if user and user.is_active else "user removed"
 
     def serialize_comments(self, comment):
+        likes = getattr(comment, "likes_count", None)
         return {
+            "id": comment.id,
             "body": comment.body,
             "user": self.get_display_user(comment.user),
-            "likes": comment.likes,
+            "likes": comment.liked_by.count() if likes is None else likes,
             "timestamp": comment.timestamp.strftime("%b %d %Y, %I:%M %p"),
         }
 
-    def serialize(self, current_user=None):
-        is_liked = False
+    @classmethod
+    def attach_comment_previews(cls, posts, limit=None):
+        """Loads comment counts and the newest `limit` comments for a whole page of posts.
+
+        Two queries regardless of page size: a grouped count and a ROW_NUMBER()
+        window over the comments of every post on the page.
+        """
+        posts = list(posts)
+        groups = by_database(posts)
+        if len(groups) > 1:
+            for group in groups.values():
+                cls.attach_comment_previews(group, limit)
+            return posts
+        using = next(iter(groups), DEFAULT_DB_ALIAS)
+
+        if limit is None:
+            limit = getattr(settings, "COMMENT_PREVIEW_SIZE", 3)
+        ids = [post.id for post in posts]
+        counts = dict(
+            cls.objects.using(using)
+            .filter(parent_id__in=ids)
+            .order_by()
+            .values("parent_id")
+            .annotate(total=Count("id"))
+            .values_list("parent_id", "total")
+        )
+        previews = {}
+        if limit and counts:
+            newest = (
+                cls.objects.using(using)
+                .filter(parent_id__in=ids)
+                .select_related("user")
+                .annotate(
+                    likes_count=Count("liked_by"),
+                    row=Window(
+                        RowNumber(),
+                        partition_by=[F("parent_id")],
+                        order_by=[F("timestamp").desc(), F("id").desc()],
+                    ),
+                )
+                .filter(row__lte=limit)
+                .order_by("parent_id", "row")
+            )
+            for comment in newest:
+                previews.setdefault(comment.parent_id, []).append(comment)
+        for post in posts:
+            post._comment_count = counts.get(post.id, 0)
+            post._comment_preview = previews.get(post.id, [])
+        return posts
+
+    def reply_tree(self, max_depth=3, max_nodes=500):
+        """Returns the nested replies under this post, `max_depth` levels deep.
+
+        The tree is collected with one recursive CTE instead of walking `comments`
+        level by level.
+        """
+        table = self._meta.db_table
+        replies = self.__class__.objects.db_manager(self._state.db).raw(
+            f"""
+            WITH RECURSIVE thread(id, depth) AS (
+                SELECT id, 1 FROM {table} WHERE parent_id = %s
+                UNION ALL
+                SELECT child.id, thread.depth + 1
+                FROM {table} AS child JOIN thread ON child.parent_id = thread.id
+                WHERE thread.depth < %s
+            )
+            SELECT post.*, thread.depth FROM {table} AS post
+            JOIN thread ON post.id = thread.id
+            ORDER BY thread.depth, post.timestamp, post.id
+            LIMIT %s
+            """,
+            [self.id, max_depth, max_nodes],
+        ).prefetch_related("user")
+        replies = list(replies)
+        likes = dict(
+            Like.objects.using(self._state.db)
+            .filter(post_id__in=[reply.id for reply in replies])
+            .order_by()
+            .values("post_id")
+            .annotate(total=Count("id"))
+            .values_list("post_id", "total")
+        )
+
+        nodes = {self.id: {"replies": []}}
+        for reply in replies:
+            reply.likes_count = likes.get(reply.id, 0)
+            node = self.serialize_comments(reply)
+            node.update({"depth": reply.depth, "replies": []})
+            nodes[reply.id] = node
+            parent = nodes.get(reply.parent_id)
+            if parent is not None:
+                parent["replies"].append(node)
+        return nodes[self.id]["replies"]
+
+    @classmethod
+    def attach_likes(cls, posts, current_user=None):
+        """Loads like counts and `current_user`'s likes for a whole page in two queries."""
+        posts = list(posts)
+        groups = by_database(posts)
+        if len(groups) > 1:
+            for group in groups.values():
+                cls.attach_likes(group, current_user)
+            return posts
+        using = next(iter(groups), DEFAULT_DB_ALIAS)
+
+        ids = [post.id for post in posts]
+        counts = dict(
+            Like.objects.using(using)
+            .filter(post_id__in=ids)
+            .order_by()
+            .values("post_id")
+            .annotate(total=Count("id"))
+            .values_list("post_id", "total")
+        )
+        liked = set()
         if current_user and hasattr(current_user, "is_authenticated") and current_user.is_authenticated:
-            is_liked = self.liked_by.filter(user=current_user).exists()
-        return {
-            "id": self.id,
-            "user": self.get_display_user(self.user),
-            "body": self.body,
-            "likes": self.liked_by.count(),
-            "timestamp": self.timestamp.strftime("%b %d %Y, %I:%M %p"),
-            "comments": [
+            liked = set(
+                Like.objects.using(using)
+                .filter(user=current_user, post_id__in=ids)
+                .values_list("post_id", flat=True)
+            )
+        for post in posts:
+            post._likes_count = counts.get(post.id, 0)
+            post._liked = post.id in liked
+        return posts
+
+    @classmethod
+    def prepare_page(cls, posts, current_user=None, fields=None):
+        """Batch-loads only what the requested `fields` need for a page of posts.
+
+        Pages may mix in `ArchivedPost` rows, which are prepared separately.
+        """
+        posts = list(posts)
+        archived = [post for post in posts if isinstance(post, ArchivedPost)]
+        if archived:
+            ArchivedPost.prepare_page(archived, current_user, fields)
+            hot = [post for post in posts if not isinstance(post, ArchivedPost)]
+            cls.prepare_page(hot, current_user, fields)
+            return posts
+
+        if fields is None or "user" in fields:
+            prefetch_related_objects(posts, "user")
+        if fields is None or fields & {"comments", "comments_count"}:
+            # A limit of 0 runs only the grouped count
+            limit = None if fields is None or "comments" in fields else 0
+            cls.attach_comment_previews(posts, limit)
+        if fields is None or fields & {"likes", "liked"}:
+            cls.attach_likes(posts, current_user)
+        return posts
+
+    def serialize(self, current_user=None, fields=None):
+        """`fields` limits the output to those keys; omitted ones are never computed."""
+        if fields is None:
+            fields = set(self.SERIALIZED_FIELDS)
+        if fields & {"comments", "comments_count"} and not hasattr(self, "_comment_preview"):
+            self.attach_comment_previews([self], None if "comments" in fields else 0)
+        if fields & {"likes", "liked"} and not hasattr(self, "_likes_count"):
+            self.attach_likes([self], current_user)
+
+        serializers = {
+            "id": lambda: self.id,
+            "user": lambda: self.get_display_user(self.user),
+            "body": lambda: self.body,
+            "likes": lambda: self._likes_count,
+            "timestamp": lambda: self.timestamp.strftime("%b %d %Y, %I:%M %p"),
+            "comments": lambda: [
                 self.serialize_comments(comment)
-                for comment in self.comments.all()
+                for comment in self._comment_preview
             ],
-            "liked": is_liked
+            "comments_count": lambda: self._comment_count,
+            "liked": lambda: self._liked,
+        }
+        return {
+            name: value() for name, value in serializers.items() if name in fields
         }
 
     class Meta:
         ordering = ["-timestamp"]
+        indexes = [
+            models.Index(fields=["-timestamp", "-id"], name="posts_timestamp_idx"),
+            models.Index(fields=["user", "-timestamp", "-id"], name="posts_user_feed_idx"),
+            models.Index(fields=["parent", "-timestamp", "-id"], name="posts_thread_idx"),
+        ]
         
 class Like(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="liked")
@@ -64,3 +269,244 @@ class Like(models.Model):
     
     class Meta:
         unique_together = ("user", "post")
+
+
+class TrendingScore(models.Model):
+    post = models.OneToOneField(
+        Posts, on_delete=models.CASCADE, primary_key=True, related_name="trending"
+    )
+    score = models.FloatField()
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [models.Index(fields=["-score"], name="trending_score_idx")]
+
+
+class PostTag(models.Model):
+    """Inverted index from a #tag to the posts carrying it (see network.tags)."""
+
+    tag = models.CharField(max_length=64)
+    post = models.ForeignKey(Posts, on_delete=models.CASCADE, related_name="tags")
+    # Copy of post.timestamp so a tag feed is one range read on the index below
+    timestamp = models.DateTimeField()
+
+    class Meta:
+        unique_together = ("tag", "post")
+        indexes = [
+            models.Index(fields=["tag", "-timestamp", "-post"], name="posttag_feed_idx")
+        ]
+
+
+class PostMention(models.Model):
+    """Inverted index from a mentioned @user to the posts mentioning them."""
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="mentions")
+    post = models.ForeignKey(Posts, on_delete=models.CASCADE, related_name="mentions")
+    timestamp = models.DateTimeField()
+
+    class Meta:
+        unique_together = ("user", "post")
+        indexes = [
+            models.Index(fields=["user", "-timestamp", "-post"], name="postmention_feed_idx")
+        ]
+
+
+class FollowSuggestion(models.Model):
+    """Precomputed who-to-follow candidates (see network.suggestions)."""
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="suggestions")
+    suggested = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    score = models.PositiveIntegerField()
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        unique_together = ("user", "rank")
+
+    def serialize(self):
+        return {"username": self.suggested.username, "mutual": self.score}
+
+
+class ArchivedPost(models.Model):
+    """A post moved out of the hot tables once its thread went quiet (see network.archive).
+
+    Likes are folded into `likes`; `parent_id` is kept as a plain column since
+    the whole thread is archived together.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, related_name="archived_posts"
+    )
+    body = models.TextField()
+    timestamp = models.DateTimeField()
+    parent_id = models.BigIntegerField(null=True, blank=True)
+    likes = models.PositiveIntegerField(default=0)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    # Archived posts serialize exactly like hot ones; the attach_* methods
+    # below fill in what Posts.serialize reads.
+    SERIALIZED_FIELDS = Posts.SERIALIZED_FIELDS
+    get_display_user = Posts.get_display_user
+    serialize_comments = Posts.serialize_comments
+    serialize = Posts.serialize
+
+    @property
+    def likes_count(self):
+        return self.likes
+
+    @classmethod
+    def attach_comment_previews(cls, posts, limit=None):
+        posts = list(posts)
+        groups = by_database(posts)
+        if len(groups) > 1:
+            for group in groups.values():
+                cls.attach_comment_previews(group, limit)
+            return posts
+        using = next(iter(groups), DEFAULT_DB_ALIAS)
+
+        if limit is None:
+            limit = getattr(settings, "COMMENT_PREVIEW_SIZE", 3)
+        ids = [post.id for post in posts]
+        comments = cls.objects.using(using).filter(parent_id__in=ids)
+        counts = dict(
+            comments.order_by()
+            .values("parent_id")
+            .annotate(total=Count("id"))
+            .values_list("parent_id", "total")
+        )
+        previews = {}
+        if limit and counts:
+            newest = (
+                comments.select_related("user")
+                .annotate(
+                    row=Window(
+                        RowNumber(),
+                        partition_by=[F("parent_id")],
+                        order_by=[F("timestamp").desc(), F("id").desc()],
+                    ),
+                )
+                .filter(row__lte=limit)
+                .order_by("parent_id", "row")
+            )
+            for comment in newest:
+                previews.setdefault(comment.parent_id, []).append(comment)
+        for post in posts:
+            post._comment_count = counts.get(post.id, 0)
+            post._comment_preview = previews.get(post.id, [])
+        return posts
+
+    @classmethod
+    def attach_likes(cls, posts, current_user=None):
+        """Individual likes are not archived, so nobody is reported as a liker."""
+        for post in posts:
+            post._likes_count = post.likes
+            post._liked = False
+        return posts
+
+    @classmethod
+    def prepare_page(cls, posts, current_user=None, fields=None):
+        posts = list(posts)
+        if fields is None or "user" in fields:
+            prefetch_related_objects(posts, "user")
+        if fields is None or fields & {"comments", "comments_count"}:
+            limit = None if fields is None or "comments" in fields else 0
+            cls.attach_comment_previews(posts, limit)
+        return cls.attach_likes(posts, current_user)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "-timestamp", "-id"], name="archive_user_feed_idx"),
+            models.Index(fields=["parent_id", "-timestamp", "-id"], name="archive_thread_idx"),
+        ]
+
+
+class PostSequence(models.Model):
+    """Allocates post ids when posts are sharded (see network.sharding)."""
+
+    id = models.BigAutoField(primary_key=True)
+
+
+class AccountRemoval(models.Model):
+    """Checkpoint of a background account removal (see network.account_removal)."""
+
+    STAGES = ["likes", "follows", "posts", "archive", "done"]
+
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="removal")
+    stage = models.CharField(max_length=16, default="likes")
+    processed = models.PositiveIntegerField(default=0)
+    requested_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+
+class Notification(models.Model):
+    """Likes, comments and follows for `recipient`, coalesced while unread (see network.notifications)."""
+
+    VERBS = {
+        "like": "liked your post",
+        "comment": "commented on your post",
+        "follow": "followed you",
+    }
+
+    recipient = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="notifications"
+    )
+    verb = models.CharField(max_length=16)
+    # Plain column: the post may live on another shard or in the archive
+    post_id = models.BigIntegerField(null=True, blank=True)
+    last_actor = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, related_name="+"
+    )
+    # Distinct actors, kept in step with the NotificationActor rows
+    actor_count = models.PositiveIntegerField(default=1)
+    unread = models.BooleanField(default=True)
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["recipient", "-updated_at", "-id"], name="notification_inbox_idx"
+            ),
+            models.Index(
+                fields=["recipient", "verb", "post_id"],
+                condition=models.Q(unread=True),
+                name="notification_unread_idx",
+            ),
+        ]
+
+    def serialize(self):
+        actor = self.last_actor
+        actor = actor.username if actor and actor.is_active else "Someone"
+        others = self.actor_count - 1
+        who = actor if not others else f"{actor} and {others} other{'s' if others > 1 else ''}"
+        return {
+            "id": self.id,
+            "verb": self.verb,
+            "post": self.post_id,
+            "actor": actor,
+            "others": others,
+            "message": f"{who} {self.VERBS[self.verb]}",
+            "unread": self.unread,
+            "timestamp": self.updated_at.strftime("%b %d %Y, %I:%M %p"),
+        }
+
+
+class NotificationActor(models.Model):
+    """Who contributed to a coalesced notification, so each actor counts once."""
+
+    notification = models.ForeignKey(
+        Notification, on_delete=models.CASCADE, related_name="actors"
+    )
+    actor = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+
+    class Meta:
+        unique_together = ("notification", "actor")
+
+
+class NotificationCount(models.Model):
+    """Stored unread counter so polling the badge is a single primary-key read."""
+
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True, related_name="notification_count"
+    )
+    unread = models.PositiveIntegerField(default=0)
@@ -0,0 +1,160 @@
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from .models import Notification, NotificationActor, NotificationCount
+
+pending = ContextVar("pending_notifications", default=None)
+
+
+def notify(recipient_id, verb, actor_id, post_id=None):
+    """Queues an event for the current batch, or writes it now outside of one.
+
+    Events about the actor's own content are dropped.
+    """
+    if recipient_id is None or recipient_id == actor_id:
+        return
+    event = (recipient_id, verb, post_id, actor_id)
+    batch = pending.get()
+    if batch is None:
+        write_notifications([event])
+    else:
+        batch.append(event)
+
+
+@contextmanager
+def batched_notifications():
+    """Collects `notify()` calls and writes them together on exit.
+
+    Producers that raise many events at once (bulk jobs, fan-out loops) get a
+    fixed number of queries for the whole batch.
+    """
+    batch = []
+    token = pending.set(batch)
+    try:
+        yield batch
+    finally:
+        pending.reset(token)
+        if batch:
+            write_notifications(batch)
+
+
+def write_notifications(events):
+    """Coalesces events into unread notifications and bumps the unread counters.
+
+    An event with the same recipient, verb and post as an unread notification
+    is folded into it ("X and 41 others liked your post"). `actor_count`
+    counts distinct NotificationActor rows, so an actor repeating themselves
+    (liking again after unliking) is not news. Only new notifications count
+    towards the recipient's unread counter. Costs a fixed number of queries
+    per batch, not per event.
+    """
+    now = timezone.now()
+    grouped = {}
+    for recipient_id, verb, post_id, actor_id in events:
+        actors = grouped.setdefault((recipient_id, verb, post_id), {})
+        actors.pop(actor_id, None)
+        actors[actor_id] = True  # keeps distinct actors, most recent last
+
+    with transaction.atomic():
+        # One lookup per key, each served by the partial notification_unread_idx
+        keys = reduce(
+            or_,
+            (
+                Q(recipient_id=recipient_id, verb=verb, post_id=post_id)
+                for recipient_id, verb, post_id in grouped
+            ),
+        )
+        existing = {
+            (notification.recipient_id, notification.verb, notification.post_id): notification
+            for notification in Notification.objects.select_for_update().filter(
+                keys, unread=True
+            )
+        }
+
+        created = {
+            key: Notification(
+                recipient_id=key[0],
+                verb=key[1],
+                post_id=key[2],
+                last_actor_id=list(actors)[-1],
+                actor_count=len(actors),
+                updated_at=now,
+            )
+            for key, actors in grouped.items()
+            if key not in existing
+        }
+        Notification.objects.bulk_create(created.values())
+
+        notifications = {**existing, **created}
+        NotificationActor.objects.bulk_create(
+            [
+                NotificationActor(notification=notifications[key], actor_id=actor_id)
+                for key, actors in grouped.items()
+                for actor_id in actors
+            ],
+            ignore_conflicts=True,
+        )
+
+        updated = []
+        if existing:
+            counts = dict(
+                NotificationActor.objects.filter(notification__in=existing.values())
+                .values("notification_id")
+                .annotate(total=Count("id"))
+                .values_list("notification_id", "total")
+            )
+            for key, notification in existing.items():
+                total = counts.get(notification.id, notification.actor_count)
+                last_actor_id = list(grouped[key])[-1]
+                unchanged = total == notification.actor_count
+                if unchanged and last_actor_id == notification.last_actor_id:
+                    continue
+                # Only a new actor moves the notification up the inbox
+                if not unchanged:
+                    notification.actor_count = total
+                    notification.updated_at = now
+                notification.last_actor_id = last_actor_id
+                updated.append(notification)
+        Notification.objects.bulk_update(
+            updated, ["actor_count", "last_actor_id", "updated_at"]
+        )
+
+        new_unread = Counter(key[0] for key in created)
+        NotificationCount.objects.bulk_create(
+            [NotificationCount(user_id=user_id) for user_id in new_unread],
+            ignore_conflicts=True,
+        )
+        by_increment = {}
+        for user_id, increment in new_unread.items():
+            by_increment.setdefault(increment, []).append(user_id)
+        for increment, user_ids in by_increment.items():
+            NotificationCount.objects.filter(user_id__in=user_ids).update(
+                unread=F("unread") + increment
+            )
+    return len(created), len(updated)
+
+
+def unread_count(user):
+    return (
+        NotificationCount.objects.filter(user=user).values_list("unread", flat=True).first()
+        or 0
+    )
+
+
+def mark_read(user, ids=None):
+    """Marks the user's notifications (or only `ids`) read and lowers the counter to match."""
+    with transaction.atomic():
+        notifications = Notification.objects.filter(recipient=user, unread=True)
+        if ids is not None:
+            notifications = notifications.filter(id__in=ids)
+        marked = notifications.update(unread=False)
+        if marked:
+            NotificationCount.objects.filter(user=user).update(unread=F("unread") - marked)
+    return marked
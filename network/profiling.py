@@ -0,0 +1,101 @@
+import hmac
+import json
+import os
+import random
+import time
+import uuid
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+
+def profile_setting(name, default):
+    return getattr(settings, f"PROFILE_{name}", default)
+
+
+def should_profile(request):
+    """True for requests carrying the PROFILE_TOKEN header or picked 1-in-PROFILE_SAMPLE_RATE."""
+    token = profile_setting("TOKEN", "")
+    sent = request.META.get("HTTP_X_PROFILE_TOKEN", "")
+    if token and sent:
+        return hmac.compare_digest(sent, token)
+    rate = profile_setting("SAMPLE_RATE", 0)
+    return bool(rate) and random.randrange(rate) == 0
+
+
+class QueryRecorder:
+    """`execute_wrapper` hook that notes each statement's SQL, database and duration."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append(
+                {
+                    "sql": sql,
+                    "database": context["connection"].alias,
+                    "ms": (time.perf_counter() - start) * 1000,
+                }
+            )
+
+    def recording(self):
+        """Context manager that records on every configured database."""
+        stack = ExitStack()
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(self))
+        return stack
+
+
+def save_profile(profiler, request, response, duration_ms, queries):
+    """Writes `<id>.prof` (pstats format) and `<id>.json` (request and SQL), then prunes."""
+    directory = profile_setting("DIR", "profiles")
+    os.makedirs(directory, exist_ok=True)
+    profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    profiler.dump_stats(os.path.join(directory, f"{profile_id}.prof"))
+    summary = {
+        "id": profile_id,
+        "method": request.method,
+        "path": request.get_full_path(),
+        "status": response.status_code,
+        "ms": duration_ms,
+        "sql_ms": sum(query["ms"] for query in queries),
+        "queries": queries,
+    }
+    with open(os.path.join(directory, f"{profile_id}.json"), "w") as file:
+        json.dump(summary, file)
+    prune_profiles(directory, profile_setting("MAX_BYTES", 50 * 1024 * 1024))
+    return profile_id
+
+
+def prune_profiles(directory, max_bytes):
+    """Deletes the oldest captures until the directory fits in `max_bytes`."""
+    files = [
+        entry for entry in os.scandir(directory)
+        if entry.is_file() and entry.name.endswith((".prof", ".json"))
+    ]
+    total = sum(entry.stat().st_size for entry in files)
+    for entry in sorted(files, key=lambda entry: entry.name):
+        if total <= max_bytes:
+            break
+        total -= entry.stat().st_size
+        os.remove(entry.path)
+
+
+def load_profiles(directory=None):
+    """Summaries of every complete capture in the profile directory."""
+    directory = directory or profile_setting("DIR", "profiles")
+    if not os.path.isdir(directory):
+        return []
+    summaries = []
+    for name in sorted(os.listdir(directory)):
+        stem, extension = os.path.splitext(name)
+        if extension != ".json" or not os.path.exists(os.path.join(directory, f"{stem}.prof")):
+            continue
+        with open(os.path.join(directory, name)) as file:
+            summaries.append(json.load(file))
+    return summaries
@@ -0,0 +1,366 @@
+"""Optional user sharding of posts across several databases.
+
+When `NETWORK_SHARDS` lists database aliases, each thread (a top-level post,
+its comments, likes, tags, mentions and trending score) is stored on the shard
+of the thread author, picked by user id. Users, follows and everything else
+stay on "default"; user rows are copied to every shard so foreign keys hold.
+
+Feeds keyed by author (profiles, the following feed) still ask every shard:
+an author's comments live on the shards of the threads they replied to. Each
+page costs one COUNT and one bounded read per shard, merged in memory, so
+reads grow with the number of shards rather than with the number of authors.
+
+With `NETWORK_SHARDS` empty every helper here returns plain querysets on
+"default", so the rest of the app behaves exactly as before.
+"""
+
+import heapq
+from functools import reduce
+from itertools import islice
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import (
+    ArchivedPost, Like, PostMention, Posts, PostSequence, PostTag, TrendingScore, User
+)
+
+# Models stored alongside the thread they belong to
+THREAD_MODELS = {Posts, Like, PostTag, PostMention, TrendingScore, ArchivedPost}
+
+
+def shards():
+    return list(getattr(settings, "NETWORK_SHARDS", []))
+
+
+def sharding_enabled():
+    return bool(shards())
+
+
+def post_databases():
+    """Every alias that may hold posts."""
+    return shards() or [DEFAULT_DB_ALIAS]
+
+
+def shard_for_user(user_id):
+    aliases = shards()
+    if not aliases:
+        return DEFAULT_DB_ALIAS
+    return aliases[(user_id or 0) % len(aliases)]
+
+
+class UserShardRouter:
+    """Routes thread models to their shard; everything else to "default".
+
+    Plain manager queries have no instance to route by, so reads of thread
+    models go through `sharded()`, `find_post()` or `using()` explicitly.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not sharding_enabled():
+            return None
+        if model not in THREAD_MODELS:
+            return DEFAULT_DB_ALIAS
+        instance = hints.get("instance")
+        if instance is not None and type(instance) in THREAD_MODELS:
+            return instance._state.db
+        return None
+
+    def db_for_write(self, model, **hints):
+        if not sharding_enabled():
+            return None
+        if model not in THREAD_MODELS:
+            return DEFAULT_DB_ALIAS
+        instance = hints.get("instance")
+        if isinstance(instance, User):
+            return shard_for_user(instance.pk)
+        if isinstance(instance, Posts):
+            if not instance._state.adding:
+                return instance._state.db
+            parent = instance._meta.get_field("parent").get_cached_value(instance, None)
+            if parent is not None:
+                return parent._state.db
+            if instance.parent_id:
+                return find_post(instance.parent_id)._state.db
+            return shard_for_user(instance.user_id)
+        if instance is not None and type(instance) in THREAD_MODELS:
+            return instance._state.db
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if sharding_enabled() and {type(obj1), type(obj2)} & THREAD_MODELS:
+            return True
+        return None
+
+
+class ShardedQuerySet:
+    """Scatter-gather view over the same query on several databases.
+
+    Also merges tables that share the ordering columns, like hot and archived
+    posts (see network.archive).
+
+    Supports what the feeds need: filtering, ordering, counting and slicing.
+    Slices fetch at most `stop` rows per shard and k-way merge them on the
+    ordering fields, so a page costs one bounded range read per shard.
+    """
+
+    def __init__(self, querysets, ordering=None):
+        self.querysets = querysets
+        self.ordering = ordering or ["-timestamp", "-id"]
+
+    def clone(self, method, *args, **kwargs):
+        querysets = [
+            getattr(queryset, method)(*args, **kwargs) for queryset in self.querysets
+        ]
+        return ShardedQuerySet(querysets, self.ordering)
+
+    def filter(self, *args, **kwargs):
+        return self.clone("filter", *args, **kwargs)
+
+    def exclude(self, *args, **kwargs):
+        return self.clone("exclude", *args, **kwargs)
+
+    def select_related(self, *fields):
+        return self.clone("select_related", *fields)
+
+    def order_by(self, *fields):
+        sharded = self.clone("order_by", *fields)
+        sharded.ordering = list(fields) or self.ordering
+        return sharded
+
+    def count(self):
+        return sum(queryset.count() for queryset in self.querysets)
+
+    def exists(self):
+        return any(queryset.exists() for queryset in self.querysets)
+
+    def aggregate(self, **expressions):
+        """Combines per-shard Count/Sum (added) and Max/Min aggregates."""
+        results = [queryset.aggregate(**expressions) for queryset in self.querysets]
+        combined = {}
+        for name, expression in expressions.items():
+            values = [result[name] for result in results if result[name] is not None]
+            kind = type(expression).__name__
+            if kind in ("Count", "Sum"):
+                combined[name] = sum(values)
+            elif values:
+                combined[name] = (max if kind == "Max" else min)(values)
+            else:
+                combined[name] = None
+        return combined
+
+    def sort_key(self, item):
+        key = []
+        for field in self.ordering:
+            value = reduce(getattr, field.lstrip("-").split("__"), item)
+            key.append(value)
+        return tuple(key)
+
+    def merged(self, limit=None):
+        descending = {field.startswith("-") for field in self.ordering}
+        rows = []
+        for queryset in self.querysets:
+            queryset = queryset.order_by(*self.ordering)
+            rows.append(list(queryset[:limit] if limit else queryset))
+        if len(descending) == 1:
+            return heapq.merge(*rows, key=self.sort_key, reverse=descending.pop())
+        return iter(sorted(sum(rows, []), key=self.sort_key))
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return list(islice(self.merged(key + 1), key, key + 1))[0]
+        return list(islice(self.merged(key.stop), key.start or 0, key.stop))
+
+    def __iter__(self):
+        return self.merged()
+
+
+def sharded(queryset, aliases=None):
+    """Runs `queryset` on every shard (or on `aliases`) when sharding is on."""
+    if not sharding_enabled():
+        return queryset
+    aliases = shards() if aliases is None else aliases
+    return ShardedQuerySet(
+        [queryset.using(alias) for alias in aliases], list(queryset.query.order_by) or None
+    )
+
+
+def user_posts(user):
+    """Everything `user` wrote, asking every shard.
+
+    Their threads live on their own shard, but their comments live with the
+    threads they replied to, which can be anywhere.
+    """
+    return sharded(Posts.objects.filter(user=user))
+
+
+def following_posts(user):
+    """Posts and comments of the accounts `user` follows, from every shard."""
+    if not sharding_enabled():
+        Follow = User.followers.through
+        return Posts.objects.filter(
+            user_id__in=Follow.objects.filter(to_user=user).values("from_user_id")
+        )
+    following = list(user.following.values_list("id", flat=True))
+    return sharded(Posts.objects.filter(user_id__in=following))
+
+
+def find_post(post_id, queryset=None):
+    """Looks a post up by id on whichever shard holds it."""
+    queryset = Posts.objects.all() if queryset is None else queryset
+    for alias in post_databases():
+        post = queryset.using(alias).filter(id=post_id).first()
+        if post is not None:
+            return post
+    raise Posts.DoesNotExist(f"Post {post_id} does not exist.")
+
+
+def find_posts(ids):
+    """`in_bulk` over every shard, with authors loaded."""
+    posts = {}
+    for alias in post_databases():
+        posts.update(Posts.objects.using(alias).select_related("user").in_bulk(ids))
+    return posts
+
+
+@receiver(pre_save, sender=Posts)
+def allocate_post_id(sender, instance, raw=False, **kwargs):
+    """Draws new post ids from one sequence on "default" so ids stay unique across shards."""
+    if sharding_enabled() and instance.pk is None and not raw:
+        instance.pk = PostSequence.objects.using(DEFAULT_DB_ALIAS).create().pk
+
+
+@receiver(post_save, sender=User)
+def replicate_user(sender, instance, using, raw=False, **kwargs):
+    if using != DEFAULT_DB_ALIAS or raw:
+        return
+    values = {
+        field.attname: getattr(instance, field.attname)
+        for field in User._meta.concrete_fields
+        if not field.primary_key
+    }
+    for alias in shards():
+        User.objects.using(alias).update_or_create(pk=instance.pk, defaults=values)
+
+
+@receiver(post_delete, sender=User)
+def remove_replicated_user(sender, instance, using, **kwargs):
+    if using == DEFAULT_DB_ALIAS:
+        for alias in shards():
+            User.objects.using(alias).filter(pk=instance.pk).delete()
+
+
+def sync_users(batch_size=1000):
+    """Copies every user row from "default" to each shard."""
+    copied = 0
+    last_id = 0
+    while True:
+        users = list(
+            User.objects.using(DEFAULT_DB_ALIAS)
+            .filter(id__gt=last_id)
+            .order_by("id")[:batch_size]
+        )
+        if not users:
+            return copied
+        for alias in shards():
+            existing = set(
+                User.objects.using(alias)
+                .filter(id__in=[user.id for user in users])
+                .values_list("id", flat=True)
+            )
+            User.objects.using(alias).bulk_create(
+                [user for user in users if user.id not in existing]
+            )
+        copied += len(users)
+        last_id = users[-1].id
+
+
+def bump_post_sequence():
+    """Moves the id sequence past every post id already stored anywhere."""
+    def highest_id(queryset):
+        return queryset.order_by("-id").values_list("id", flat=True).first() or 0
+
+    highest = max(
+        highest_id(Posts.objects.using(alias)) for alias in [DEFAULT_DB_ALIAS] + shards()
+    )
+    if highest > highest_id(PostSequence.objects.using(DEFAULT_DB_ALIAS)):
+        PostSequence.objects.using(DEFAULT_DB_ALIAS).create(id=highest)
+
+
+def thread_ids(alias, root_ids):
+    """Ids of the given roots and all their replies, parents before children."""
+    table = Posts._meta.db_table
+    placeholders = ", ".join(["%s"] * len(root_ids))
+    with connections[alias].cursor() as cursor:
+        cursor.execute(
+            f"""
+            WITH RECURSIVE thread(id, depth) AS (
+                SELECT id, 0 FROM {table} WHERE id IN ({placeholders})
+                UNION ALL
+                SELECT child.id, thread.depth + 1
+                FROM {table} AS child JOIN thread ON child.parent_id = thread.id
+            )
+            SELECT id FROM thread ORDER BY depth, id
+            """,
+            root_ids,
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def move_threads(source, target, root_ids):
+    """Copies whole threads to `target`, then deletes them from `source`.
+
+    The copy ignores rows that already exist, so a run interrupted between the
+    two steps is repaired by running it again.
+    """
+    ids = thread_ids(source, root_ids)
+    by_id = Posts.objects.using(source).in_bulk(ids)
+    posts = [by_id[post_id] for post_id in ids]
+    related = [
+        list(model.objects.using(source).filter(post_id__in=ids))
+        for model in (Like, PostTag, PostMention)
+    ]
+    scores = list(TrendingScore.objects.using(source).filter(post_id__in=ids))
+
+    with transaction.atomic(using=target):
+        Posts.objects.using(target).bulk_create(posts, ignore_conflicts=True)
+        for rows in related:
+            for row in rows:
+                row.pk = None
+            if rows:
+                type(rows[0]).objects.using(target).bulk_create(rows, ignore_conflicts=True)
+        TrendingScore.objects.using(target).bulk_create(scores, ignore_conflicts=True)
+    with transaction.atomic(using=source):
+        Posts.objects.using(source).filter(id__in=root_ids).delete()
+    return len(posts)
+
+
+def rebalance(batch_size=200):
+    """Moves every thread that is not on its author's shard. Returns posts moved."""
+    sync_users()
+    bump_post_sequence()
+    moved = 0
+    for source in [DEFAULT_DB_ALIAS] + shards():
+        last_id = 0
+        while True:
+            roots = list(
+                Posts.objects.using(source)
+                .filter(parent__isnull=True, id__gt=last_id)
+                .order_by("id")
+                .values_list("id", "user_id")[:batch_size]
+            )
+            if not roots:
+                break
+            last_id = roots[-1][0]
+            targets = {}
+            for root_id, user_id in roots:
+                target = shard_for_user(user_id)
+                if user_id is None:
+                    target = source if source in shards() else shards()[0]
+                if target != source:
+                    targets.setdefault(target, []).append(root_id)
+            for target, root_ids in targets.items():
+                moved += move_threads(source, target, root_ids)
+    return moved
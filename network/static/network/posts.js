@@ -1,3 +1,79 @@
+// Feed pages cached by API URL. Fresh entries are served without a request;
+// older ones are revalidated with their ETag so unchanged pages come back as 304.
+const FEED_TTL_MS = 30000;
+const feedCache = new Map();
+const inflightRequests = new Map();
+const pendingLikes = new Set();
+
+function cachedFetch(url) {
+  if (inflightRequests.has(url)) {
+    return inflightRequests.get(url);
+  }
+  const cached = feedCache.get(url);
+  if (cached && Date.now() - cached.fetchedAt < FEED_TTL_MS) {
+    return Promise.resolve(cached.data);
+  }
+
+  const headers = cached && cached.etag ? { "If-None-Match": cached.etag } : {};
+  const request = fetch(url, { headers, cache: "no-store" })
+    .then((response) => {
+      if (response.status === 304 && cached) {
+        cached.fetchedAt = Date.now();
+        return cached.data;
+      }
+      if (!response.ok) throw new Error(`Request failed: ${response.status}`);
+      return response.json().then((data) => {
+        feedCache.set(url, {
+          data,
+          etag: response.headers.get("ETag"),
+          fetchedAt: Date.now(),
+        });
+        return data;
+      });
+    })
+    .finally(() => inflightRequests.delete(url));
+
+  inflightRequests.set(url, request);
+  return request;
+}
+
+function invalidateFeedCache(predicate = () => true) {
+  for (const url of feedCache.keys()) {
+    if (predicate(url)) feedCache.delete(url);
+  }
+}
+
+function patchCachedPost(id, changes) {
+  feedCache.forEach((entry) => {
+    (entry.data.data || []).forEach((post) => {
+      if (post.id === id) Object.assign(post, changes);
+    });
+  });
+}
+
+// Builds the API URL of a page, replacing any page param so each page has one cache key
+function pageURL(apiPath, page) {
+  const basePath = apiPath.replace(/[?&]page=\d+/, "");
+  const sep = basePath.includes("?") ? "&" : "?";
+  return `${basePath}${sep}page=${page}`;
+}
+
+function prefetchNextPage(data, apiPath) {
+  window.onscroll = null;
+  if (!data.has_next) return;
+  const nextURL = pageURL(apiPath, data.current_page + 1);
+
+  window.onscroll = () => {
+    const remaining =
+      document.documentElement.scrollHeight -
+      (window.innerHeight + window.scrollY);
+    if (remaining < 600) {
+      window.onscroll = null;
+      cachedFetch(nextURL).catch(() => {});
+    }
+  };
+}
+
 window.onpopstate = function (event) {
   if (event.state && event.state.dataPath) {
     navigateTo(event.state.uiPath, event.state.dataPath, false);
@@ -27,6 +103,8 @@ function loadURL(path) {
     navigateTo(`/profile/${username}`, `/posts/profile/${username}`);
   } else if (path === "/following") {
     navigateTo("/following", "/posts/following");
+  } else if (path === "/trending") {
+    navigateTo("/trending", "/posts/trending");
   } else if (path === "/all" || path === "/") {
     navigateTo("/all", "/posts/all");
   } else {
@@ -48,6 +126,9 @@ document.addEventListener("DOMContentLoaded", function () {
   document.querySelector("#allposts-link").addEventListener("click", () => {
     navigateTo("/all", "/posts/all");
   });
+  document.querySelector("#trending-link").addEventListener("click", () => {
+    navigateTo("/trending", "/posts/trending");
+  });
   const followingLink = document.querySelector("#following-link");
   if (followingLink) {
     followingLink.addEventListener("click", () => {
@@ -78,8 +159,7 @@ function loadPage(apiPath) {
   document.querySelector("#following-view").style.display = "none";
   document.querySelector("#profile-view").style.display = "none";
 
-  fetch(apiPath)
-    .then((response) => response.json())
+  cachedFetch(apiPath)
     .then((data) => {
       postsContainer.innerHTML = "";
 
@@ -93,6 +173,7 @@ function loadPage(apiPath) {
 
       renderPagination(data, apiPath);
       renderPosts(data.data);
+      prefetchNextPage(data, apiPath);
     })
     .catch((error) => {
       console.error("Error loading page:", error);
@@ -147,8 +228,7 @@ function renderPagination(data, apiPath) {
     link.addEventListener("click", (e) => {
       e.preventDefault();
       const page = link.getAttribute("data-page");
-      const sep = apiPath.includes("?") ? "&" : "?";
-      navigateTo(window.location.pathname, `${apiPath}${sep}page=${page}`);
+      navigateTo(window.location.pathname, pageURL(apiPath, page));
     });
   });
 
@@ -156,10 +236,9 @@ function renderPagination(data, apiPath) {
   if (prev && data.has_previous) {
     prev.addEventListener("click", (e) => {
       e.preventDefault();
-      const sep = apiPath.includes("?") ? "&" : "?";
       navigateTo(
         window.location.pathname,
-        `${apiPath}${sep}page=${data.current_page - 1}`
+        pageURL(apiPath, data.current_page - 1)
       );
     });
   }
@@ -168,10 +247,9 @@ function renderPagination(data, apiPath) {
   if (next && data.has_next) {
     next.addEventListener("click", (e) => {
       e.preventDefault();
-      const sep = apiPath.includes("?") ? "&" : "?";
       navigateTo(
         window.location.pathname,
-        `${apiPath}${sep}page=${data.current_page + 1}`
+        pageURL(apiPath, data.current_page + 1)
       );
     });
   }
@@ -225,7 +303,7 @@ function renderFollowingPage(data) {
 
 function renderAllPage(data) {
   const viewTitle = document.querySelector("#view-title");
-  viewTitle.innerHTML = `<h3>Public Feed</h3>`;
+  viewTitle.innerHTML = `<h3>${data.page_name || "Public Feed"}</h3>`;
 }
 
 function renderPosts(postsData) {
@@ -342,6 +420,7 @@ function toggleEdit(id, element) {
           textArea.replaceWith(postBody);
           postBody.textContent = updatedText;
           buttonContainer.remove();
+          patchCachedPost(id, { body: updatedText });
           showToast("✅ Post updated successfully!");
           return;
         }
@@ -364,6 +443,10 @@ function toggleEdit(id, element) {
 }
 
 function toggleLike(id, postElement, likeIcon) {
+  // Ignore repeated clicks while the previous toggle is still in flight
+  if (pendingLikes.has(id)) return;
+  pendingLikes.add(id);
+
   fetch(`/posts/${id}`, {
     method: "PUT",
     headers: {
@@ -381,6 +464,7 @@ function toggleLike(id, postElement, likeIcon) {
       const likeCountElement = postElement.querySelector(".like-count");
       likeCountElement.textContent = data.likes;
       likeIcon.dataset.liked = data.liked;
+      patchCachedPost(id, { likes: data.likes, liked: data.liked });
       if (data.liked) {
         console.log("liked");
         likeIcon.classList.remove("bi-heart", "like-icon");
@@ -398,7 +482,8 @@ function toggleLike(id, postElement, likeIcon) {
     .catch((error) => {
       console.error("Error toggling like:", error);
       showToast("⚠️ Failed to toggle like. Please try again.");
-    });
+    })
+    .finally(() => pendingLikes.delete(id));
 }
 
 function insertNewPost() {
@@ -416,6 +501,7 @@ function insertNewPost() {
     .then((result) => {
       console.log(result);
       document.querySelector("#post-body").value = "";
+      invalidateFeedCache();
       navigateTo("/all", "/posts/all");
     })
     .catch((error) => {
@@ -445,6 +531,11 @@ function toggleFollow(username) {
     })
     .then((data) => {
       console.log(data.message);
+      invalidateFeedCache(
+        (url) =>
+          url.startsWith("/posts/following") ||
+          url.startsWith(`/posts/profile/${username}`)
+      );
 
       if (data.action === "unfollowed") {
         button.textContent = "Follow";
@@ -0,0 +1,49 @@
+import gzip
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip variants are always written
+    brotli = None
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Hashed static files plus precompressed .gz/.br siblings.
+
+    The variants are written once at collectstatic time so `network.assets`
+    can serve them without compressing anything per request.
+    """
+
+    compressible_extensions = (".css", ".js", ".json", ".map", ".svg", ".txt", ".html")
+    min_compress_size = 256
+
+    def post_process(self, paths, dry_run=False, **options):
+        processed_names = []
+        for name, hashed_name, processed in super().post_process(
+            paths, dry_run=dry_run, **options
+        ):
+            if hashed_name and not isinstance(processed, Exception):
+                processed_names.extend([name, hashed_name])
+            yield name, hashed_name, processed
+
+        if dry_run:
+            return
+        for name in dict.fromkeys(processed_names):
+            if name.endswith(self.compressible_extensions):
+                self.compress(name)
+
+    def compress(self, name):
+        path = self.path(name)
+        with open(path, "rb") as source:
+            content = source.read()
+        if len(content) < self.min_compress_size:
+            return
+
+        variants = [(".gz", gzip.compress(content, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variants.append((".br", brotli.compress(content)))
+        for extension, compressed in variants:
+            if len(compressed) < len(content):
+                with open(path + extension, "wb") as target:
+                    target.write(compressed)
@@ -0,0 +1,92 @@
+import heapq
+from array import array
+from bisect import bisect_left
+
+from django.db import transaction
+
+from .models import FollowSuggestion, User
+
+
+class FollowGraph:
+    """Follow edges in compressed sparse row form.
+
+    Users are renumbered to dense indexes; the accounts followed by the user at
+    index `i` are `targets[offsets[i]:offsets[i + 1]]`. Two flat integer arrays
+    keep even large graphs at a few bytes per edge.
+    """
+
+    def __init__(self, user_ids, offsets, targets):
+        self.user_ids = user_ids
+        self.offsets = offsets
+        self.targets = targets
+
+    @classmethod
+    def load(cls):
+        active = User.objects.filter(is_active=True).order_by("id")
+        user_ids = array("q", active.values_list("id", flat=True))
+        offsets = array("q", [0] * (len(user_ids) + 1))
+        targets = array("q")
+
+        Follow = User.followers.through
+        # `to_user` follows `from_user`; ordering by follower fills rows in order
+        edges = (
+            Follow.objects.order_by("to_user_id", "from_user_id")
+            .values_list("to_user_id", "from_user_id")
+            .iterator(chunk_size=10000)
+        )
+        graph = cls(user_ids, offsets, targets)
+        for follower, followed in edges:
+            source, target = graph.index(follower), graph.index(followed)
+            if source is None or target is None:
+                continue
+            targets.append(target)
+            offsets[source + 1] += 1
+        for i in range(len(user_ids)):
+            offsets[i + 1] += offsets[i]
+        return graph
+
+    def index(self, user_id):
+        position = bisect_left(self.user_ids, user_id)
+        if position < len(self.user_ids) and self.user_ids[position] == user_id:
+            return position
+        return None
+
+    def follows(self, index):
+        return self.targets[self.offsets[index] : self.offsets[index + 1]]
+
+    def two_hop_candidates(self, index, top_k):
+        """Top `top_k` accounts followed by people `index` follows, by mutual count."""
+        direct = set(self.follows(index))
+        counts = {}
+        for middle in direct:
+            for candidate in self.follows(middle):
+                if candidate != index and candidate not in direct:
+                    counts[candidate] = counts.get(candidate, 0) + 1
+        best = heapq.nlargest(top_k, counts.items(), key=lambda item: (item[1], -item[0]))
+        return [(self.user_ids[candidate], score) for candidate, score in best]
+
+
+def refresh_suggestions(top_k=10, batch_size=500):
+    """Recomputes every user's suggestions, replacing them a batch of users at a time."""
+    graph = FollowGraph.load()
+    FollowSuggestion.objects.filter(user__is_active=False).delete()
+    total = 0
+    for start in range(0, len(graph.user_ids), batch_size):
+        indexes = range(start, min(start + batch_size, len(graph.user_ids)))
+        rows = [
+            FollowSuggestion(
+                user_id=graph.user_ids[index],
+                suggested_id=candidate,
+                score=score,
+                rank=rank,
+            )
+            for index in indexes
+            for rank, (candidate, score) in enumerate(graph.two_hop_candidates(index, top_k))
+        ]
+        with transaction.atomic():
+            FollowSuggestion.objects.filter(
+                user_id__in=[graph.user_ids[index] for index in indexes]
+            ).delete()
+            FollowSuggestion.objects.bulk_create(rows)
+        total += len(rows)
+    return total
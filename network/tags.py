@@ -0,0 +1,58 @@
+import re
+
+from django.db import transaction
+
+from .models import PostMention, PostTag, User, by_database
+
+TAG_RE = re.compile(r"(?<![\w#])#(\w{1,64})")
+MENTION_RE = re.compile(r"(?<![\w@])@([\w.@+-]{1,150})")
+
+
+def extract_tags(body):
+    return {tag.lower() for tag in TAG_RE.findall(body)}
+
+
+def extract_mentions(body):
+    return {name.rstrip(".") for name in MENTION_RE.findall(body)} - {""}
+
+
+def index_posts(posts):
+    """Rebuilds the tag and mention rows of `posts` from their current bodies.
+
+    Mentioned usernames for the whole batch are resolved in one query. Rows are
+    written to the database each post was loaded from.
+    """
+    posts = list(posts)
+    groups = by_database(posts)
+    if len(groups) > 1:
+        totals = [index_posts(group) for group in groups.values()]
+        return tuple(map(sum, zip(*totals)))
+    using = next(iter(groups), None)
+
+    mentioned = {post.id: extract_mentions(post.body) for post in posts}
+    names = set().union(*mentioned.values())
+    users = {}
+    if names:
+        users = dict(
+            User.objects.filter(username__in=names).values_list("username", "id")
+        )
+
+    tags, mentions = [], []
+    for post in posts:
+        tags.extend(
+            PostTag(tag=tag, post=post, timestamp=post.timestamp)
+            for tag in extract_tags(post.body)
+        )
+        mentions.extend(
+            PostMention(user_id=users[name], post=post, timestamp=post.timestamp)
+            for name in mentioned[post.id]
+            if name in users
+        )
+
+    ids = [post.id for post in posts]
+    with transaction.atomic(using=using):
+        PostTag.objects.using(using).filter(post_id__in=ids).delete()
+        PostMention.objects.using(using).filter(post_id__in=ids).delete()
+        PostTag.objects.using(using).bulk_create(tags)
+        PostMention.objects.using(using).bulk_create(mentions)
+    return len(tags), len(mentions)
@@ -1,21 +1,59 @@
-from datetime import datetime
+from datetime import datetime, timedelta
+from io import StringIO
+import gzip
 import json
-from django.test import Client, TestCase
+import os
+import shutil
+import tempfile
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.db.models import QuerySet
+from unittest import skipUnless
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 
-from network.models import Posts, User
+from network import middleware
+from network.admin import EstimatedCountPaginator, IndexedDrilldownQuerySet
+from network.assets import hashed_names
+from network.account_removal import request_account_removal, run_account_removal
+from network.archive import archive_old_posts, profile_posts
+from network.models import (
+    AccountRemoval, ArchivedPost, Like, Notification, PostMention, Posts, PostTag, TrendingScore,
+    User
+)
+from network.notifications import batched_notifications, notify
+from network.profiling import load_profiles, prune_profiles
+from network.sharding import find_post, rebalance, shard_for_user
+from network.suggestions import FollowGraph, refresh_suggestions
+from network.tags import extract_mentions, extract_tags
+from network.trending import refresh_trending_scores
+from network.views import posts_newer_than
 
 
 # Create your tests here.
 class BaseTestCase(TestCase):
+    """Shared fixtures: two users, logged in as the first.
+
+    Classes that set `sample_posts` also get four posts (two liked by fresh
+    accounts) and "test" following "second".
+    """
+
+    sample_posts = False
+
     def setUp(self):
         self.client = Client()
         self.user = self.create_user("test")
         self.user2 = self.create_user("second")
-        self.post1 = self.create_post(body="Post 1")
-        self.post2 = self.create_post(body="Post 2")
-        self.post3 = self.create_post(body="Post 3", user=self.user2, likes=10)
-        self.post3 = self.create_post(body="Post 4", user=self.user2, likes=5)
-        self.user.following.add(self.user2)
+        if self.sample_posts:
+            self.post1 = self.create_post(body="Post 1")
+            self.post2 = self.create_post(body="Post 2")
+            self.post3 = self.create_post(body="Post 3", user=self.user2, likes=10)
+            self.post3 = self.create_post(body="Post 4", user=self.user2, likes=5)
+            self.user.following.add(self.user2)
         self.login_as(self.user)
 
     def create_user(self, username, is_active=True):
@@ -23,17 +61,34 @@ class BaseTestCase(TestCase):
             username=username, password="123456", is_active=is_active
         )
 
-    def create_post(self, user=None, body="Test post", parent=None, likes=0):
-        return Posts.objects.create(
-            user=user or self.user, body=body, parent=parent, likes=likes
+    def create_post(self, user=None, body="Test post", parent=None, likes=0, age=None):
+        """`likes` creates that many `Like` rows from fresh accounts; `age` backdates the post."""
+        post = Posts.objects.create(user=user or self.user, body=body, parent=parent)
+        if likes:
+            likers = User.objects.bulk_create(
+                User(username=f"liker-{post.id}-{i}") for i in range(likes)
+            )
+            self.like(post, *likers)
+        if age is not None:
+            Posts.objects.using(post._state.db).filter(pk=post.pk).update(
+                timestamp=timezone.now() - age
+            )
+            post.refresh_from_db()
+        return post
+
+    def like(self, post, *users):
+        Like.objects.using(post._state.db).bulk_create(
+            Like(user=user, post=post) for user in users
         )
 
     def login_as(self, user):
         self.client.logout()
-        self.client.login(username=user.username, password="123456")
+        self.client.force_login(user)
 
 
 class PostModelTest(BaseTestCase):
+    sample_posts = True
+
     def setUp(self):
         super().setUp()
         self.inactive_user = User.objects.create_user(
@@ -72,6 +127,13 @@ class PostModelTest(BaseTestCase):
         self.assertEqual(serialized_comment["user"], "test")
         self.assertEqual(serialized_comment["likes"], 0)
 
+    def test_comment_likes_and_count(self):
+        self.create_post(body="Liked comment", parent=self.post_active_user, likes=2)
+        serialized_post = self.post_active_user.serialize()
+        self.assertEqual(serialized_post["comments_count"], 2)
+        self.assertEqual(serialized_post["comments"][0]["body"], "Liked comment")
+        self.assertEqual(serialized_post["comments"][0]["likes"], 2)
+
     def test_comment_with_inactive_user(self):
         self.comment.user = self.inactive_user
         self.comment.save()
@@ -80,6 +142,8 @@ class PostModelTest(BaseTestCase):
 
 
 class UserModelTest(BaseTestCase):
+    sample_posts = True
+
     def setUp(self):
         super().setUp()
         self.alice = self.create_user("alice")
@@ -105,12 +169,16 @@ class UserModelTest(BaseTestCase):
             {
                 "username": "test",
                 "followers": ["alice"],
+                "followers_count": 1,
                 "following": ["second", "alice", "bob", "charlie"],
+                "following_count": 4,
             },
         )
 
 
 class PostByIdEndpointTest(BaseTestCase):
+    sample_posts = True
+
     def setUp(self):
         super().setUp()
         self.post = self.create_post(body="Just a post.")
@@ -156,13 +224,22 @@ class PostByIdEndpointTest(BaseTestCase):
         self.login_as(self.user2)
         response = self.client.put(
             f"/posts/{self.comment.id}",
-            data=json.dumps({"body": "Updated comment", "likes": 10}),
+            data=json.dumps({"body": "Updated comment"}),
             content_type="application/json",
         )
         self.assertEqual(response.status_code, 204)
         self.comment.refresh_from_db()
         self.assertEqual(self.comment.body, "Updated comment")
-        self.assertEqual(self.comment.likes, 10)
+        self.assertEqual(self.post.serialize()["comments"][0]["body"], "Updated comment")
+
+    def test_put_method_likes_not_writable(self):
+        response = self.client.put(
+            f"/posts/{self.post.id}",
+            data=json.dumps({"likes": 10}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.post.serialize()["likes"], 0)
 
     def test_put_method_invalid_keys(self):
         response = self.client.put(
@@ -172,7 +249,7 @@ class PostByIdEndpointTest(BaseTestCase):
         )
         self.assertEqual(response.status_code, 400)
         self.assertEqual(
-            response.json().get("error"), "Only 'body' or 'likes' fields are allowed."
+            response.json().get("error"), "Only 'body' field is allowed."
         )
 
     def test_put_method_invalid_json(self):
@@ -193,6 +270,8 @@ class PostByIdEndpointTest(BaseTestCase):
 
 
 class SharePostTest(BaseTestCase):
+    sample_posts = True
+
     def test_get_request_not_allowed(self):
         response = self.client.get("/posts")
         self.assertEqual(response.status_code, 400)
@@ -287,6 +366,8 @@ class PageTestMixin:
 
 
 class GetPageTest(BaseTestCase, PageTestMixin):
+    sample_posts = True
+
     def test_put_request_method(self):
         response = self.client.put(
             "/posts/random_page", content_type="/application/json"
@@ -316,6 +397,8 @@ class GetPageTest(BaseTestCase, PageTestMixin):
 
 
 class ProfilePageTest(BaseTestCase, PageTestMixin):
+    sample_posts = True
+
     def test_profile_page(self):
         data = self.assert_valid_response("profile")
         self.assertIn("username", data)
@@ -326,8 +409,17 @@ class ProfilePageTest(BaseTestCase, PageTestMixin):
         self.assertNotIn("Post 3", bodies)
         self.assert_post_order_by_timestamp_desc(data["data"])
 
+    def test_own_profile_requires_login(self):
+        self.client.logout()
+        response = self.client.get("/posts/profile")
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json().get("error"), "Login required.")
+        self.assertEqual(self.client.get("/posts/profile/test").status_code, 200)
+
 
 class AllPageTest(BaseTestCase, PageTestMixin):
+    sample_posts = True
+
     def test_all_page(self):
         data = self.assert_valid_response("all")
         self.assert_posts_validity(data, 4)
@@ -337,8 +429,950 @@ class AllPageTest(BaseTestCase, PageTestMixin):
 
 
 class FollowingPageTest(BaseTestCase, PageTestMixin):
+    sample_posts = True
+
     def test_following_page(self):
         data = self.assert_valid_response("following")
         self.assert_posts_validity(data, 2)
         self.assert_post_metadata(data["data"][1], "Post 3", 10, self.user2.username)
         self.assert_post_order_by_timestamp_desc(data["data"])
+
+
+class TrendingPageTest(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.fans = [self.create_user(f"fan{i}") for i in range(4)]
+        self.fresh = self.create_post(body="Fresh", age=timedelta(hours=1))
+        self.stale = self.create_post(body="Stale", age=timedelta(hours=30))
+        self.expired = self.create_post(body="Expired", age=timedelta(days=5))
+        self.quiet = self.create_post(body="Quiet")
+        self.like(self.fresh, *self.fans[:2])
+        self.like(self.stale, *self.fans)
+        self.like(self.expired, *self.fans)
+        self.create_post(user=self.user2, body="Reply", parent=self.fresh)
+
+    def test_refresh_ranks_by_decayed_engagement(self):
+        self.assertEqual(refresh_trending_scores(), 2)
+        ranked = list(
+            TrendingScore.objects.order_by("-score").values_list("post_id", flat=True)
+        )
+        self.assertEqual(ranked, [self.fresh.id, self.stale.id])
+
+    def test_refresh_replaces_previous_ranking(self):
+        refresh_trending_scores()
+        Like.objects.filter(post=self.stale).delete()
+        refresh_trending_scores()
+        self.assertFalse(TrendingScore.objects.filter(post=self.stale).exists())
+
+    def test_trending_page(self):
+        refresh_trending_scores()
+        response = self.client.get("/posts/trending")
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["page_name"], "Trending")
+        self.assertEqual([post["body"] for post in data["data"]], ["Fresh", "Stale"])
+        self.assertEqual(data["num_pages"], 1)
+        self.assertFalse(data["has_next"])
+
+    def test_trending_page_invalid_page_number(self):
+        refresh_trending_scores()
+        response = self.client.get("/posts/trending?page=3")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json().get("error"), "Invalid page number.")
+
+
+@override_settings(COMMENT_PREVIEW_SIZE=2)
+class CommentThreadTest(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.post = self.create_post(body="Root")
+        self.comments = [
+            self.create_post(
+                user=self.user2,
+                body=f"Comment {i}",
+                parent=self.post,
+                age=timedelta(minutes=30 - i),
+            )
+            for i in range(15)
+        ]
+        self.reply = self.create_post(body="Reply", parent=self.comments[0])
+        self.nested = self.create_post(
+            user=self.user2, body="Nested", parent=self.reply
+        )
+        self.like(self.comments[-1], self.user)
+
+    def test_feed_carries_count_and_newest_comments(self):
+        item = self.post.serialize()
+        self.assertEqual(item["comments_count"], 15)
+        self.assertEqual(
+            [comment["body"] for comment in item["comments"]],
+            ["Comment 14", "Comment 13"],
+        )
+        self.assertEqual(item["comments"][0]["likes"], 1)
+
+    def test_previews_cost_constant_queries_per_page(self):
+        for i in range(5):
+            parent = self.create_post(body=f"Other {i}")
+            self.create_post(body="Other comment", parent=parent)
+        posts = list(Posts.objects.filter(parent__isnull=True))
+        with self.assertNumQueries(2):
+            Posts.attach_comment_previews(posts)
+        self.assertEqual(
+            [len(post._comment_preview) for post in posts], [1] * 5 + [2]
+        )
+
+    def test_comments_endpoint_pages_by_cursor(self):
+        response = self.client.get(f"/posts/{self.post.id}/comments")
+        self.assertEqual(response.status_code, 200)
+        first = response.json()
+        self.assertTrue(first["has_next"])
+        self.assertEqual(len(first["data"]), 10)
+        self.assertEqual(first["data"][0]["body"], "Comment 14")
+
+        response = self.client.get(
+            f"/posts/{self.post.id}/comments?cursor={first['next_cursor']}"
+        )
+        second = response.json()
+        self.assertFalse(second["has_next"])
+        self.assertIsNone(second["next_cursor"])
+        self.assertEqual(
+            [item["body"] for item in second["data"]],
+            [f"Comment {i}" for i in range(4, -1, -1)],
+        )
+        self.assertEqual(second["data"][-1]["comments_count"], 1)
+
+    def test_comments_endpoint_invalid_cursor(self):
+        response = self.client.get(f"/posts/{self.post.id}/comments?cursor=nope")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json().get("error"), "Invalid cursor.")
+
+    def test_thread_is_depth_limited(self):
+        response = self.client.get(f"/posts/{self.post.id}/thread?depth=2")
+        self.assertEqual(response.status_code, 200)
+        replies = response.json()["replies"]
+        self.assertEqual(len(replies), 15)
+        first = replies[0]
+        self.assertEqual(first["body"], "Comment 0")
+        self.assertEqual([reply["body"] for reply in first["replies"]], ["Reply"])
+        self.assertEqual(first["replies"][0]["replies"], [])
+
+        deep = self.post.reply_tree(max_depth=3)
+        self.assertEqual(deep[0]["replies"][0]["replies"][0]["body"], "Nested")
+        self.assertEqual(deep[0]["replies"][0]["replies"][0]["depth"], 3)
+
+    def test_thread_unknown_post(self):
+        response = self.client.get("/posts/9999/thread")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json().get("error"), "Post cannot be found.")
+
+
+class SessionAuthOverheadTest(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.post = self.create_post(body="Like me")
+        cache.clear()
+
+    def toggle_like(self):
+        return self.client.put(
+            f"/posts/{self.post.id}",
+            data=json.dumps({"action": "toggle_like"}),
+            content_type="application/json",
+        )
+
+    def test_cached_user_skips_session_and_user_reads(self):
+        with CaptureQueriesContext(connection) as cold:
+            self.assertEqual(self.client.get(f"/posts/{self.post.id}").status_code, 200)
+        with CaptureQueriesContext(connection) as warm:
+            self.assertEqual(self.client.get(f"/posts/{self.post.id}").status_code, 200)
+
+        self.assertEqual(len(warm), len(cold) - 1)
+        self.assertFalse(
+            any("django_session" in query["sql"] for query in warm.captured_queries)
+        )
+
+    def test_saving_user_invalidates_cache(self):
+        self.toggle_like()
+        self.user.is_active = False
+        self.user.save()
+        response = self.toggle_like()
+        self.assertEqual(response.status_code, 302)
+
+    def test_password_change_ends_session(self):
+        self.toggle_like()
+        self.user.set_password("changed")
+        self.user.save()
+        self.assertEqual(self.toggle_like().status_code, 302)
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command("bench_auth", "test", requests=3, stdout=out)
+        self.assertIn("queries per request", out.getvalue())
+
+
+class StaticAssetTest(TestCase):
+    def setUp(self):
+        self.static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.static_root)
+        settings_override = override_settings(STATIC_ROOT=self.static_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        call_command("collectstatic", interactive=False, verbosity=0)
+        self.hashed_js = staticfiles_storage.stored_name("network/posts.js")
+
+    def test_hashed_names_built_once_per_manifest(self):
+        names = hashed_names(staticfiles_storage)
+        self.assertIn(self.hashed_js, names)
+        self.assertNotIn("network/posts.js", names)
+        self.assertIs(hashed_names(staticfiles_storage), names)
+
+    def test_collectstatic_writes_hashed_and_gzip_variants(self):
+        self.assertNotEqual(self.hashed_js, "network/posts.js")
+        self.assertTrue(staticfiles_storage.exists(self.hashed_js + ".gz"))
+
+    def test_hashed_asset_is_immutable_and_precompressed(self):
+        response = self.client.get(
+            f"/static/{self.hashed_js}", HTTP_ACCEPT_ENCODING="gzip, deflate"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Cache-Control"], "public, max-age=31536000, immutable")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("javascript", response["Content-Type"])
+        body = gzip.decompress(b"".join(response.streaming_content))
+        self.assertIn(b"function loadPage", body)
+
+    def test_unhashed_asset_revalidates_uncompressed(self):
+        response = self.client.get("/static/network/posts.js")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Cache-Control"], "public, max-age=0, must-revalidate")
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+    def test_missing_and_traversal_paths(self):
+        self.assertEqual(self.client.get("/static/network/missing.js").status_code, 404)
+        self.assertEqual(self.client.get("/static/../manage.py").status_code, 404)
+
+
+class FeedRevalidationTest(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.create_post(body="Cached")
+
+    def test_unchanged_feed_revalidates_with_etag(self):
+        response = self.client.get("/posts/all")
+        etag = response["ETag"]
+        self.assertTrue(etag)
+
+        response = self.client.get("/posts/all", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+    def test_changed_feed_returns_new_body(self):
+        etag = self.client.get("/posts/all")["ETag"]
+        self.create_post(body="Fresh")
+        response = self.client.get("/posts/all", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["data"][0]["body"], "Fresh")
+
+
+class AccountRemovalTest(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.posts = [self.create_post(body=f"Post {i}") for i in range(5)]
+        self.other = self.create_post(user=self.user2, body="Other")
+        self.like(self.other, self.user)
+        self.like(self.posts[0], self.user2)
+        self.user.following.add(self.user2)
+        self.user.followers.add(self.user2)
+
+    def test_request_deactivates_immediately(self):
+        response = self.client.delete("/account")
+        self.assertEqual(response.status_code, 202)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        self.assertEqual(self.user.removal.stage, "likes")
+        self.assertEqual(self.posts[0].serialize()["user"], "user removed")
+        self.assertEqual(self.client.get(f"/posts/{self.other.id}").status_code, 302)
+
+    def test_batches_are_resumable(self):
+        job = request_account_removal(self.user)
+        run_account_removal(job, batch_size=2, max_batches=3)
+        self.assertNotEqual(job.stage, "done")
+
+        job = AccountRemoval.objects.get(pk=job.pk)
+        run_account_removal(job, batch_size=2)
+        self.assertEqual(job.stage, "done")
+        self.assertIsNotNone(job.completed_at)
+        self.assertEqual(job.processed, 1 + 2 + 5)
+
+        self.assertFalse(Like.objects.filter(user=self.user).exists())
+        self.assertTrue(Like.objects.filter(post=self.posts[0]).exists())
+        self.assertFalse(Posts.objects.filter(user=self.user).exists())
+        self.assertEqual(Posts.objects.filter(user__isnull=True).count(), 5)
+        self.assertFalse(self.user2.followers.exists())
+        self.assertFalse(self.user2.following.exists())
+
+    def test_command_processes_pending_jobs(self):
+        request_account_removal(self.user)
+        call_command("process_account_removals", pause=0, stdout=StringIO())
+        self.assertEqual(AccountRemoval.objects.get(user=self.user).stage, "done")
+
+
+# Rendered pages resolve {% static %} through the manifest, which only exists
+# after collectstatic; tests that render templates use plain storage instead.
+PLAIN_STATIC_STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+
+
+@override_settings(STORAGES=PLAIN_STATIC_STORAGES)
+class AdminChangelistTest(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_superuser("admin", "admin@example.com", "123456")
+        self.client.force_login(self.admin)
+        self.old = self.create_post(body="Old", age=timedelta(days=400))
+        self.post = self.create_post(body="Recent")
+        self.like(self.post, self.user2)
+
+    def test_changelists_and_change_forms_render(self):
+        for url in [
+            "/admin/network/user/",
+            "/admin/network/posts/",
+            "/admin/network/like/",
+            f"/admin/network/user/{self.user.id}/change/",
+            f"/admin/network/posts/{self.post.id}/change/",
+        ]:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_user_form_does_not_list_every_user(self):
+        response = self.client.get(f"/admin/network/user/{self.user.id}/change/")
+        self.assertNotContains(response, "<select name=\"followers\"")
+        self.assertContains(response, "vManyToManyRawIdAdminField")
+
+    def test_search_uses_exact_and_prefix_lookups(self):
+        response = self.client.get("/admin/network/user/?q=sec")
+        self.assertEqual(list(response.context["cl"].result_list), [self.user2])
+        response = self.client.get("/admin/network/posts/?q=test")
+        self.assertEqual(len(response.context["cl"].result_list), 2)
+        response = self.client.get("/admin/network/posts/?q=tes")
+        self.assertEqual(len(response.context["cl"].result_list), 0)
+
+    def test_date_hierarchy_probes_ranges(self):
+        years = Posts.objects.all()
+        years = IndexedDrilldownQuerySet(model=Posts, query=years.query).datetimes(
+            "timestamp", "year"
+        )
+        self.assertEqual(
+            [year.year for year in years],
+            sorted({self.old.timestamp.year, self.post.timestamp.year}),
+        )
+        response = self.client.get(
+            f"/admin/network/posts/?timestamp__year={self.post.timestamp.year}"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(self.post, response.context["cl"].result_list)
+
+    def test_unfiltered_count_uses_table_statistics(self):
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        paginator = EstimatedCountPaginator(Posts.objects.all(), 50)
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(paginator.count, Posts.objects.count())
+        self.assertNotIn("COUNT", context.captured_queries[0]["sql"])
+
+
+class TagMentionFeedTest(BaseTestCase):
+    def share(self, body):
+        response = self.client.post(
+            "/posts", data=json.dumps({"body": body}), content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 201)
+        return Posts.objects.order_by("-id").first()
+
+    def test_extraction(self):
+        body = "Hi @second and @nobody. #Django #django x#nottag email@host.com"
+        self.assertEqual(extract_tags(body), {"django"})
+        self.assertEqual(extract_mentions(body), {"second", "nobody"})
+
+    def test_share_post_indexes_tags_and_mentions(self):
+        post = self.share("Hello @second #News")
+        self.assertEqual(list(post.tags.values_list("tag", flat=True)), ["news"])
+        self.assertEqual(list(post.mentions.values_list("user", flat=True)), [self.user2.id])
+
+    def test_edit_reindexes(self):
+        post = self.share("#old")
+        response = self.client.put(
+            f"/posts/{post.id}",
+            data=json.dumps({"body": "#new"}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(list(post.tags.values_list("tag", flat=True)), ["new"])
+
+    def test_tag_feed_pages_by_cursor(self):
+        posts = [
+            self.create_post(body=f"#python post {i}", age=timedelta(minutes=20 - i))
+            for i in range(12)
+        ]
+        self.create_post(body="#other")
+        call_command("backfill_post_index", batch_size=5, stdout=StringIO())
+
+        first = self.client.get("/posts/tag/Python").json()
+        self.assertEqual(first["page_name"], "#python")
+        self.assertEqual(len(first["data"]), 10)
+        self.assertEqual(first["data"][0]["id"], posts[-1].id)
+        self.assertTrue(first["has_next"])
+
+        second = self.client.get(f"/posts/tag/python?cursor={first['next_cursor']}").json()
+        self.assertEqual([item["id"] for item in second["data"]], [posts[1].id, posts[0].id])
+        self.assertFalse(second["has_next"])
+
+    def test_mentions_feed(self):
+        self.create_post(user=self.user2, body="Ping @test")
+        self.create_post(user=self.user2, body="No mention")
+        call_command("backfill_post_index", stdout=StringIO())
+        data = self.client.get("/posts/mentions").json()
+        self.assertEqual(data["page_name"], "Mentions")
+        self.assertEqual([item["body"] for item in data["data"]], ["Ping @test"])
+
+    def test_mentions_feed_requires_login(self):
+        self.client.logout()
+        response = self.client.get("/posts/mentions")
+        self.assertEqual(response.status_code, 302)
+        self.assertIn("/login", response["Location"])
+
+
+class FollowSuggestionTest(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice, self.bob, self.carol, self.dave = (
+            self.create_user(name) for name in ["alice", "bob", "carol", "dave"]
+        )
+        # test -> second, alice; both follow carol; alice also follows bob and test
+        self.user.following.add(self.user2, self.alice)
+        self.user2.following.add(self.carol, self.alice)
+        self.alice.following.add(self.carol, self.bob, self.user)
+        self.dave.following.add(self.carol)
+
+    def test_graph_is_compressed_rows(self):
+        graph = FollowGraph.load()
+        index = graph.index(self.alice.id)
+        followed = {graph.user_ids[i] for i in graph.follows(index)}
+        self.assertEqual(followed, {self.carol.id, self.bob.id, self.user.id})
+        self.assertEqual(len(graph.targets), 8)
+
+    def test_two_hop_candidates_ranked_and_exclude_follows(self):
+        graph = FollowGraph.load()
+        candidates = graph.two_hop_candidates(graph.index(self.user.id), top_k=5)
+        self.assertEqual(candidates, [(self.carol.id, 2), (self.bob.id, 1)])
+
+    def test_endpoint_reads_precomputed_list(self):
+        call_command("refresh_suggestions", top_k=1, stdout=StringIO())
+        response = self.client.get("/users/suggestions")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()["suggestions"], [{"username": "carol", "mutual": 2}]
+        )
+
+    def test_refresh_replaces_stale_suggestions(self):
+        refresh_suggestions()
+        self.user.following.add(self.carol)
+        refresh_suggestions()
+        self.assertEqual(
+            list(self.user.suggestions.values_list("suggested__username", flat=True)),
+            ["bob"],
+        )
+
+
+class NewPostsSinceTest(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.user.following.add(self.user2)
+        self.seen = self.create_post(body="Seen", age=timedelta(minutes=10))
+        self.mine = self.create_post(body="Mine")
+        self.theirs = self.create_post(user=self.user2, body="Theirs")
+        self.head = {"timestamp": self.seen.timestamp.isoformat(), "id": self.seen.id}
+
+    def test_following_requires_login(self):
+        self.client.logout()
+        response = self.client.get("/posts/following/since", self.head)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(self.client.get("/posts/all/since", self.head).status_code, 200)
+
+    def test_counts_newer_posts(self):
+        response = self.client.get("/posts/all/since", self.head)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"count": 2, "max_id": self.theirs.id})
+
+    def test_following_feed_only_counts_followed_users(self):
+        data = self.client.get("/posts/following/since", self.head).json()
+        self.assertEqual(data, {"count": 1, "max_id": self.theirs.id})
+
+    def test_nothing_new(self):
+        head = {"timestamp": self.theirs.timestamp.isoformat(), "id": self.theirs.id}
+        data = self.client.get("/posts/all/since", head).json()
+        self.assertEqual(data, {"count": 0, "max_id": None})
+
+    def test_result_is_cached_briefly(self):
+        self.client.get("/posts/all/since", self.head)
+        with self.assertNumQueries(0):
+            self.client.get("/posts/all/since", self.head)
+
+    def test_count_query_reads_only_the_index(self):
+        queryset = posts_newer_than(Posts.objects.all(), self.seen.timestamp, self.seen.id)
+        plan = queryset.values("id").explain()
+        self.assertIn("COVERING INDEX posts_timestamp_idx", plan)
+
+        queryset = posts_newer_than(
+            Posts.objects.filter(user_id__in=[self.user2.id]),
+            self.seen.timestamp,
+            self.seen.id,
+        )
+        self.assertIn("COVERING INDEX posts_user_feed_idx", queryset.values("id").explain())
+
+    def test_invalid_parameters(self):
+        response = self.client.get("/posts/all/since", {"timestamp": "yesterday", "id": 1})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get("/posts/trending/since", self.head)
+        self.assertEqual(response.status_code, 404)
+
+
+class SparseFieldsetTest(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        for i in range(5):
+            post = self.create_post(body=f"Post {i} " + "lorem ipsum " * 40)
+            self.create_post(user=self.user2, body="Comment", parent=post)
+            self.like(post, self.user2)
+
+    def test_ids_and_likes_only(self):
+        response = self.client.get("/posts/all?fields=id,likes,liked")
+        self.assertEqual(response.status_code, 200)
+        item = response.json()["data"][0]
+        self.assertEqual(set(item), {"id", "likes", "liked"})
+
+    def test_omitted_fields_skip_their_queries(self):
+        self.client.get("/posts/all")
+        with CaptureQueriesContext(connection) as full:
+            self.client.get("/posts/all")
+        with CaptureQueriesContext(connection) as sparse:
+            self.client.get("/posts/all?fields=id")
+        self.assertLess(len(sparse), len(full))
+        self.assertFalse(any("network_like" in query["sql"] for query in sparse))
+        self.assertFalse(any("ROW_NUMBER" in query["sql"] for query in sparse))
+
+    def test_comment_count_skips_preview_query(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get("/posts/all?fields=id,comments_count")
+        counts = {item["id"]: item["comments_count"] for item in response.json()["data"]}
+        post = Posts.objects.filter(parent__isnull=True).first()
+        self.assertEqual(counts[post.id], 1)
+        self.assertFalse(any("ROW_NUMBER" in query["sql"] for query in context))
+
+    def test_full_page_has_constant_query_count(self):
+        self.client.get("/posts/all")
+        with CaptureQueriesContext(connection) as few:
+            self.client.get("/posts/all")
+        for i in range(5):
+            post = self.create_post(user=self.user2, body=f"More {i}")
+            self.create_post(body="Comment", parent=post)
+        with CaptureQueriesContext(connection) as many:
+            self.client.get("/posts/all")
+        self.assertEqual(len(few), len(many))
+
+    def test_unknown_field(self):
+        response = self.client.get("/posts/all?fields=id,secret")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["error"], "Unknown fields: secret.")
+
+    def test_post_and_profile_fields(self):
+        post = Posts.objects.filter(parent__isnull=True).first()
+        data = self.client.get(f"/posts/{post.id}?fields=body").json()
+        self.assertEqual(list(data), ["body"])
+
+        data = self.client.get(
+            "/posts/profile/test?fields=id&profile_fields=username,followers_count"
+        ).json()
+        self.assertEqual(data["followers_count"], 0)
+        self.assertNotIn("followers", data)
+        self.assertEqual(set(data["data"][0]), {"id"})
+
+
+class CompressionTest(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        for i in range(10):
+            self.create_post(body=f"Post {i} " + "lorem ipsum " * 40)
+
+    def test_gzip_json(self):
+        response = self.client.get("/posts/all", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertEqual(len(json.loads(gzip.decompress(response.content))["data"]), 10)
+
+    def test_html_uses_padded_gzip_not_brotli(self):
+        request = RequestFactory().get("/", HTTP_ACCEPT_ENCODING="gzip, br")
+        compress = middleware.CompressionMiddleware(lambda request: None).process_response
+        sizes = set()
+        for _ in range(5):
+            response = compress(request, HttpResponse("<form>" + "x" * 500 + "</form>"))
+            self.assertEqual(response["Content-Encoding"], "gzip")
+            sizes.add(len(response.content))
+        # GZipMiddleware pads each response with a random number of bytes
+        self.assertGreater(len(sizes), 1)
+
+    def test_uncompressed_without_accept_encoding(self):
+        response = self.client.get("/posts/all")
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+    @skipUnless(middleware.brotli, "brotli is not installed")
+    def test_brotli_preferred(self):
+        response = self.client.get("/posts/all", HTTP_ACCEPT_ENCODING="gzip, br")
+        self.assertEqual(response["Content-Encoding"], "br")
+        data = json.loads(middleware.brotli.decompress(response.content))
+        self.assertEqual(len(data["data"]), 10)
+
+    @skipUnless(middleware.brotli, "brotli is not installed")
+    def test_brotli_streaming(self):
+        request = RequestFactory().get("/", HTTP_ACCEPT_ENCODING="br")
+        chunks = [b"x" * 1000, b"y" * 1000]
+        response = middleware.CompressionMiddleware(lambda request: None).process_response(
+            request, StreamingHttpResponse(iter(chunks), content_type="application/json")
+        )
+        self.assertEqual(response["Content-Encoding"], "br")
+        body = b"".join(response.streaming_content)
+        self.assertEqual(middleware.brotli.decompress(body), b"".join(chunks))
+
+
+@override_settings(ARCHIVE_AFTER_DAYS=30)
+class ArchiveTest(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.old = self.create_post(body="old #news", age=timedelta(days=90))
+        self.old_reply = self.create_post(
+            user=self.user2, body="old reply", parent=self.old, age=timedelta(days=89)
+        )
+        self.like(self.old, self.user, self.user2)
+        self.revived = self.create_post(body="revived", age=timedelta(days=60))
+        self.create_post(user=self.user2, body="new reply", parent=self.revived)
+        self.recent = self.create_post(body="recent")
+
+    def test_quiet_threads_move_to_archive(self):
+        self.assertEqual(archive_old_posts(), 2)
+        self.assertFalse(Posts.objects.filter(id__in=[self.old.id, self.old_reply.id]).exists())
+        self.assertFalse(Like.objects.exists())
+        self.assertFalse(PostTag.objects.exists())
+        self.assertTrue(Posts.objects.filter(id=self.revived.id).exists())
+
+        archived = ArchivedPost.objects.get(id=self.old.id)
+        self.assertEqual(archived.likes, 2)
+        self.assertEqual(ArchivedPost.objects.get(id=self.old_reply.id).parent_id, self.old.id)
+        self.assertEqual(archive_old_posts(), 0)
+
+    def test_permalink_falls_back_to_archive(self):
+        archive_old_posts()
+        data = self.client.get(f"/posts/{self.old.id}").json()
+        self.assertEqual(data["body"], "old #news")
+        self.assertEqual(data["likes"], 2)
+        self.assertFalse(data["liked"])
+        self.assertEqual(data["comments_count"], 1)
+        self.assertEqual(data["comments"][0]["body"], "old reply")
+
+        response = self.client.put(f"/posts/{self.old.id}", json.dumps({"body": "edit"}))
+        self.assertEqual(response.status_code, 400)
+
+    def test_account_removal_anonymizes_archived_posts(self):
+        archive_old_posts()
+        job = request_account_removal(self.user)
+        run_account_removal(job, batch_size=1)
+        self.assertEqual(job.stage, "done")
+        self.assertFalse(ArchivedPost.objects.filter(user=self.user).exists())
+        self.assertEqual(ArchivedPost.objects.get(id=self.old.id).body, "old #news")
+
+    def test_profile_without_archive_stays_a_plain_queryset(self):
+        self.assertIsInstance(profile_posts(self.user), QuerySet)
+        archive_old_posts()
+        self.assertNotIsInstance(profile_posts(self.user), QuerySet)
+
+    def test_profile_lists_hot_then_archived_posts(self):
+        archive_old_posts()
+        for day in range(9):
+            self.create_post(body=f"filler {day}", age=timedelta(days=day + 1))
+
+        first = self.client.get("/posts/profile/test").json()
+        second = self.client.get("/posts/profile/test?page=2").json()
+        self.assertEqual(first["num_pages"], 2)
+        self.assertEqual(
+            [post["body"] for post in second["data"]], ["revived", "old #news"]
+        )
+
+
+class ProfilingTest(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.profile_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.profile_dir)
+        settings_override = override_settings(
+            PROFILE_DIR=self.profile_dir, PROFILE_TOKEN="secret", PROFILE_SAMPLE_RATE=0
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.create_post(body="profiled")
+
+    def test_token_header_captures_profile_and_sql(self):
+        response = self.client.get("/posts/all", HTTP_X_PROFILE_TOKEN="secret")
+        profile_id = response["X-Profile-Id"]
+        self.assertTrue(os.path.exists(os.path.join(self.profile_dir, f"{profile_id}.prof")))
+
+        [summary] = load_profiles(self.profile_dir)
+        self.assertEqual(summary["id"], profile_id)
+        self.assertEqual(summary["path"], "/posts/all")
+        self.assertEqual(summary["status"], 200)
+        self.assertTrue(any("network_posts" in query["sql"] for query in summary["queries"]))
+
+    def test_unsampled_requests_are_not_profiled(self):
+        response = self.client.get("/posts/all", HTTP_X_PROFILE_TOKEN="wrong")
+        self.assertFalse(response.has_header("X-Profile-Id"))
+        self.assertFalse(self.client.get("/posts/all").has_header("X-Profile-Id"))
+        with self.settings(PROFILE_SAMPLE_RATE=1):
+            self.assertTrue(self.client.get("/posts/all").has_header("X-Profile-Id"))
+        self.assertEqual(len(load_profiles(self.profile_dir)), 1)
+
+    def test_prune_deletes_oldest_first(self):
+        for name in ("a.json", "b.json", "c.json"):
+            with open(os.path.join(self.profile_dir, name), "w") as file:
+                file.write("x" * 100)
+        prune_profiles(self.profile_dir, 250)
+        self.assertEqual(sorted(os.listdir(self.profile_dir)), ["b.json", "c.json"])
+
+    def test_show_profiles_lists_and_describes(self):
+        profile_id = self.client.get(
+            "/posts/all", HTTP_X_PROFILE_TOKEN="secret"
+        )["X-Profile-Id"]
+
+        output = StringIO()
+        call_command("show_profiles", stdout=output)
+        self.assertIn(f"{profile_id}", output.getvalue())
+        self.assertIn("GET /posts/all", output.getvalue())
+
+        output = StringIO()
+        call_command("show_profiles", profile_id, stdout=output)
+        self.assertIn("Slowest queries:", output.getvalue())
+        self.assertIn("paginated_response", output.getvalue())
+
+
+class NotificationTest(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.post = self.create_post(body="mine")
+        self.fans = [self.create_user(f"fan{i}") for i in range(3)]
+
+    def act(self, user, method, path, data):
+        self.client.force_login(user)
+        self.client.generic(method, path, json.dumps(data), content_type="application/json")
+
+    def test_likes_coalesce_into_one_notification(self):
+        for fan in self.fans:
+            self.act(fan, "PUT", f"/posts/{self.post.id}", {"action": "toggle_like"})
+        # Unliking and liking again is not a new event
+        for _ in range(2):
+            self.act(self.fans[-1], "PUT", f"/posts/{self.post.id}", {"action": "toggle_like"})
+
+        self.client.force_login(self.user)
+        data = self.client.get("/notifications").json()
+        self.assertEqual(data["unread"], 1)
+        [notification] = data["data"]
+        self.assertEqual(notification["message"], "fan2 and 2 others liked your post")
+        self.assertEqual(notification["post"], self.post.id)
+
+    def test_comments_and_follows_notify(self):
+        self.act(self.user2, "POST", "/posts", {"body": "nice", "parent": self.post.id})
+        self.act(self.user2, "PUT", "/follow/test", {})
+        self.act(self.user, "POST", "/posts", {"body": "own reply", "parent": self.post.id})
+
+        self.client.force_login(self.user)
+        messages = [n["message"] for n in self.client.get("/notifications").json()["data"]]
+        self.assertEqual(messages, ["second followed you", "second commented on your post"])
+
+    def test_unread_count_is_one_query_and_mark_read(self):
+        for fan in self.fans[:2]:
+            self.act(fan, "PUT", "/follow/test", {})
+        self.client.force_login(self.user)
+        self.client.get("/notifications/unread")
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get("/notifications/unread")
+        self.assertEqual(response.json(), {"unread": 1})
+        self.assertEqual(len(context.captured_queries), 1)
+
+        response = self.client.put("/notifications/read", "{}")
+        self.assertEqual(response.json(), {"marked": 1, "unread": 0})
+
+        self.act(self.user2, "PUT", f"/posts/{self.post.id}", {"action": "toggle_like"})
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get("/notifications/unread").json(), {"unread": 1})
+        self.assertEqual(Notification.objects.filter(recipient=self.user).count(), 2)
+
+    def test_alternating_actors_count_once_each(self):
+        for actor in [self.user2, self.fans[0], self.user2, self.fans[0], self.user2]:
+            notify(self.user.id, "like", actor.id, self.post.id)
+        notification = Notification.objects.get(recipient=self.user)
+        self.assertEqual(notification.serialize()["message"], "second and 1 other liked your post")
+
+    def test_batch_writes_with_fixed_queries(self):
+        def write_batch(fans, post):
+            with CaptureQueriesContext(connection) as context:
+                with batched_notifications():
+                    for fan in fans:
+                        notify(self.user.id, "like", fan.id, post.id)
+                        notify(self.user2.id, "follow", fan.id)
+            return len(context.captured_queries)
+
+        write_batch(self.fans[:1], self.post)
+        few = write_batch(self.fans[1:2], self.create_post(body="another"))
+        self.fans += [self.create_user(f"more{i}") for i in range(3)]
+        many = write_batch(self.fans[2:], self.create_post(body="third"))
+        self.assertEqual(few, many)
+        self.assertEqual(Notification.objects.get(recipient=self.user2).actor_count, 6)
+
+
+SHARDS = ["shard_0", "shard_1"]
+
+
+@override_settings(NETWORK_SHARDS=SHARDS)
+class ShardingTest(BaseTestCase):
+    # The shard aliases only exist once setUpClass has added them
+    databases = "__all__"
+
+    @classmethod
+    def setUpClass(cls):
+        cls.shard_dir = tempfile.mkdtemp()
+        for alias in SHARDS:
+            connections.settings[alias] = {
+                **connections.settings["default"],
+                "NAME": f"{cls.shard_dir}/{alias}.sqlite3",
+            }
+            call_command("migrate", database=alias, verbosity=0)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        for alias in SHARDS:
+            connections[alias].close()
+            del connections[alias]
+            del connections.settings[alias]
+        shutil.rmtree(cls.shard_dir)
+
+    def other_shard(self, user):
+        return next(alias for alias in SHARDS if alias != shard_for_user(user.id))
+
+    def test_threads_live_on_author_shard(self):
+        post = self.create_post(body="mine")
+        comment = self.create_post(user=self.user2, body="reply", parent=post)
+        home = shard_for_user(self.user.id)
+
+        self.assertNotEqual(home, shard_for_user(self.user2.id))
+        self.assertEqual(post._state.db, home)
+        self.assertEqual(comment._state.db, home)
+        self.assertFalse(Posts.objects.using(self.other_shard(self.user)).exists())
+        self.assertEqual(find_post(comment.id).body, "reply")
+
+    def test_ids_unique_across_shards(self):
+        first = self.create_post(body="one")
+        second = self.create_post(user=self.user2, body="two")
+        self.assertNotEqual(first._state.db, second._state.db)
+        self.assertEqual(second.id, first.id + 1)
+
+    def test_like_and_tags_written_to_post_shard(self):
+        post = self.create_post(user=self.user2, body="hello")
+        response = self.client.put(
+            f"/posts/{post.id}", json.dumps({"action": "toggle_like"})
+        )
+        self.assertEqual(response.json(), {"likes": 1, "liked": True})
+        self.assertTrue(Like.objects.using(post._state.db).filter(post=post).exists())
+
+        self.client.post(
+            "/posts",
+            json.dumps({"body": "re #news", "parent": post.id}),
+            content_type="application/json",
+        )
+        tag = PostTag.objects.using(post._state.db).get(tag="news")
+        self.assertEqual(tag.post.parent_id, post.id)
+
+    def test_backfill_indexes_every_shard(self):
+        mine = self.create_post(body="#news from me")
+        theirs = self.create_post(user=self.user2, body="#news from @test")
+        self.assertNotEqual(mine._state.db, theirs._state.db)
+        for alias in SHARDS:
+            PostTag.objects.using(alias).delete()
+            PostMention.objects.using(alias).delete()
+
+        output = StringIO()
+        call_command("backfill_post_index", stdout=output)
+        for post in (mine, theirs):
+            self.assertTrue(PostTag.objects.using(post._state.db).filter(post=post).exists())
+            self.assertIn(f"[{post._state.db}] Indexed posts up to id {post.id}", output.getvalue())
+        self.assertTrue(PostMention.objects.using(theirs._state.db).exists())
+
+        with self.assertRaises(CommandError):
+            call_command("backfill_post_index", start_after=mine.id, stdout=StringIO())
+        PostTag.objects.using(theirs._state.db).delete()
+        call_command(
+            "backfill_post_index",
+            database=theirs._state.db,
+            start_after=mine.id,
+            stdout=StringIO(),
+        )
+        self.assertTrue(PostTag.objects.using(theirs._state.db).filter(post=theirs).exists())
+
+    def test_feeds_include_comments_on_other_shards(self):
+        self.create_post(body="mine", age=timedelta(minutes=5))
+        theirs = self.create_post(user=self.user2, body="theirs", age=timedelta(minutes=2))
+        comment = self.create_post(body="my comment", parent=theirs)
+        self.assertEqual(comment._state.db, self.other_shard(self.user))
+
+        profile = self.client.get("/posts/profile/test").json()
+        self.assertEqual([post["body"] for post in profile["data"]], ["my comment", "mine"])
+
+        self.user2.following.add(self.user)
+        self.client.force_login(self.user2)
+        following = self.client.get("/posts/following").json()
+        self.assertEqual([post["body"] for post in following["data"]], ["my comment", "mine"])
+
+    def test_feeds_merge_shards_newest_first(self):
+        for hours in range(12):
+            self.create_post(
+                user=[self.user, self.user2][hours % 2],
+                body=f"{hours}h",
+                age=timedelta(hours=hours),
+            )
+        self.user.following.add(self.user2)
+
+        first = self.client.get("/posts/all").json()
+        second = self.client.get("/posts/all?page=2").json()
+        bodies = [post["body"] for post in first["data"] + second["data"]]
+        self.assertEqual(bodies, [f"{hours}h" for hours in range(12)])
+        self.assertEqual(first["num_pages"], 2)
+
+        following = self.client.get("/posts/following").json()
+        self.assertEqual(
+            [post["body"] for post in following["data"]], ["1h", "3h", "5h", "7h", "9h", "11h"]
+        )
+
+    def test_rebalance_moves_threads_to_author_shard(self):
+        with self.settings(NETWORK_SHARDS=[]):
+            post = self.create_post(user=self.user2, body="legacy")
+            comment = self.create_post(body="reply", parent=post)
+            self.like(post, self.user)
+
+        self.assertEqual(rebalance(), 2)
+        home = shard_for_user(self.user2.id)
+        self.assertFalse(Posts.objects.using("default").exists())
+        self.assertEqual(
+            set(Posts.objects.using(home).values_list("id", flat=True)), {post.id, comment.id}
+        )
+        self.assertEqual(Like.objects.using(home).get().post_id, post.id)
+        self.assertGreater(self.create_post(body="new").id, comment.id)
@@ -0,0 +1,69 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import Posts, TrendingScore
+from .sharding import post_databases
+
+
+def trending_setting(name, default):
+    return getattr(settings, f"TRENDING_{name}", default)
+
+
+def decayed_score(likes, comments, age_hours):
+    """Engagement per hour of age, dampened so older posts sink."""
+    weight = trending_setting("COMMENT_WEIGHT", 2.0)
+    gravity = trending_setting("GRAVITY", 1.5)
+    return (likes + weight * comments) / (age_hours + 2) ** gravity
+
+
+def compute_trending_scores(now=None, using=DEFAULT_DB_ALIAS):
+    """Returns (post_id, score) pairs for recent top-level posts, best first."""
+    now = now or timezone.now()
+    since = now - timedelta(hours=trending_setting("WINDOW_HOURS", 48))
+    candidates = (
+        Posts.objects.using(using)
+        .filter(parent__isnull=True, timestamp__gte=since)
+        .annotate(
+            like_count=Count("liked_by", distinct=True),
+            comment_count=Count("comments", distinct=True),
+        )
+        .values_list("id", "timestamp", "like_count", "comment_count")
+    )
+
+    scores = []
+    for post_id, timestamp, likes, comments in candidates.iterator():
+        if not likes and not comments:
+            continue
+        age_hours = max((now - timestamp).total_seconds(), 0) / 3600
+        scores.append((post_id, decayed_score(likes, comments, age_hours)))
+
+    scores.sort(key=lambda item: (-item[1], -item[0]))
+    return scores[: trending_setting("LIMIT", 500)]
+
+
+def refresh_trending_scores(now=None):
+    """Rebuilds the trending table in one transaction so readers never see a partial ranking.
+
+    With sharding on, each shard scores its own posts and keeps its share of the
+    overall top `TRENDING_LIMIT`.
+    """
+    now = now or timezone.now()
+    scores = []
+    for alias in post_databases():
+        scores += [(alias, *score) for score in compute_trending_scores(now, alias)]
+    scores.sort(key=lambda item: (-item[2], -item[1]))
+    scores = scores[: trending_setting("LIMIT", 500)]
+
+    for alias in post_databases():
+        with transaction.atomic(using=alias):
+            TrendingScore.objects.using(alias).all().delete()
+            TrendingScore.objects.using(alias).bulk_create(
+                TrendingScore(post_id=post_id, score=score, computed_at=now)
+                for shard, post_id, score in scores
+                if shard == alias
+            )
+    return len(scores)
@@ -9,13 +9,22 @@ urlpatterns = [
     path("register", views.register, name="register"),
     
     # API Routes
+    path("account", views.delete_account, name="delete_account"),
     path("follow/<str:username>", views.toggle_follow, name="follow_toggle"),
+    path("users/suggestions", views.follow_suggestions, name="follow_suggestions"),
+    path("notifications", views.notifications, name="notifications"),
+    path("notifications/unread", views.unread_notifications, name="unread_notifications"),
+    path("notifications/read", views.read_notifications, name="read_notifications"),
     path("posts", views.share_post, name="share_post"),
     path("posts/<int:post_id>", views.post, name="get_post"),
+    path("posts/<int:post_id>/comments", views.comments, name="comments"),
+    path("posts/<int:post_id>/thread", views.thread, name="thread"),
     path("posts/profile/<str:username>", views.handle_profile, name="profile"),
+    path("posts/tag/<str:tag>", views.tag_feed, name="tag_feed"),
     path("posts/<str:page_name>", views.page, name="page"),
+    path("posts/<str:page_name>/since", views.new_posts_since, name="new_posts_since"),
     
     
     # Catch for frontend
-    re_path(r"^(?:all|following|profile/[^/]+)?/?$", views.index, name="spa-catchall"),
+    re_path(r"^(?:all|following|trending|profile/[^/]+)?/?$", views.index, name="spa-catchall"),
 ]
@@ -1,15 +1,29 @@
+import binascii
 import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime, timezone as dt_timezone
+from django.conf import settings
 from django.contrib.auth import authenticate, login, logout
 from django.db import IntegrityError
+from django.core.cache import cache
+from django.db.models import Count, Max, Q
 from django.http import HttpResponse, HttpResponseRedirect, JsonResponse
 from django.shortcuts import render
 from django.urls import reverse
+from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
 
-from .models import Like, Posts, User
+from .account_removal import request_account_removal
+from .archive import find_archived_post, profile_posts
+from .models import ArchivedPost, Like, PostMention, Posts, PostTag, User
+from .notifications import mark_read, notify, unread_count
+from .sharding import find_post, find_posts, following_posts, sharded
+from .tags import index_posts
+
+MAX_THREAD_DEPTH = 10
 
 
 def index(request):
@@ -91,12 +105,15 @@ def share_post(request):
     parent_post = None
     if parent_id:
         try:
-            parent_post = Posts.objects.get(id=parent_id)
+            parent_post = find_post(parent_id)
         except Posts.DoesNotExist:
             return JsonResponse({"error": "Post cannot be found."}, status=400)
 
     media_post = Posts(user=request.user, body=body, parent=parent_post)
     media_post.save()
+    index_posts([media_post])
+    if parent_post is not None:
+        notify(parent_post.user_id, "comment", request.user.id, parent_post.id)
     return JsonResponse({"message": "Post has been successfully added."}, status=201)
 
 
@@ -104,28 +121,39 @@ def share_post(request):
 @login_required
 def post(request, post_id):
     try:
-        social_post = Posts.objects.get(id=post_id)
+        social_post = find_post(post_id)
     except Posts.DoesNotExist:
-        return JsonResponse({"error": "Post cannot be found."}, status=400)
+        social_post = find_archived_post(post_id)
+        if social_post is None:
+            return JsonResponse({"error": "Post cannot be found."}, status=400)
 
     if request.method == "GET":
-        return JsonResponse(social_post.serialize(current_user=request.user))
+        try:
+            fields = requested_fields(request, Posts.SERIALIZED_FIELDS)
+        except ValueError as error:
+            return JsonResponse({"error": str(error)}, status=400)
+        return JsonResponse(
+            social_post.serialize(current_user=request.user, fields=fields)
+        )
 
     elif request.method == "PUT":
+        if isinstance(social_post, ArchivedPost):
+            return JsonResponse({"error": "Archived posts cannot be changed."}, status=400)
+
         try:
             data = json.loads(request.body)
         except json.JSONDecodeError:
             return JsonResponse({"error": "Invalid JSON."}, status=400)
 
         if data.get("action") == "toggle_like":
-            like_obj, created = Like.objects.get_or_create(
-                user=request.user, post=social_post
-            )
+            likes = Like.objects.using(social_post._state.db)
+            like_obj, created = likes.get_or_create(user=request.user, post=social_post)
             if not created:
                 like_obj.delete()
                 liked = False
             else:
                 liked = True
+                notify(social_post.user_id, "like", request.user.id, social_post.id)
 
             return JsonResponse({"likes": social_post.liked_by.count(), "liked": liked})
 
@@ -143,6 +171,7 @@ def post(request, post_id):
         if data.get("body") is not None:
             social_post.body = data["body"]
             social_post.save()
+            index_posts([social_post])
             return HttpResponse(status=204)
 
         return JsonResponse({"error": "No valid update fields provided."}, status=400)
@@ -169,22 +198,119 @@ def toggle_follow(request, username):
     else:
         target_user.followers.add(request.user)
         action = "followed"
+        notify(target_user.id, "follow", request.user.id)
 
     return JsonResponse({"message": f"Successfully {action} {username}.", "action": action}, status=200)
 
 
+@csrf_exempt
+@require_http_methods(["DELETE"])
+@login_required
+def delete_account(request):
+    """Deactivates the account immediately; its content is cleaned up in the background."""
+    request_account_removal(request.user)
+    logout(request)
+    return JsonResponse({"message": "Account scheduled for removal."}, status=202)
+
+
+@login_required
+def follow_suggestions(request):
+    """Who-to-follow list precomputed by the refresh_suggestions command."""
+    if request.method != "GET":
+        return JsonResponse({"error": "GET request required."}, status=400)
+
+    suggestions = (
+        request.user.suggestions.select_related("suggested")
+        .filter(suggested__is_active=True)
+        .order_by("rank")
+    )
+    return JsonResponse(
+        {"suggestions": [suggestion.serialize() for suggestion in suggestions]}
+    )
+
+
+@login_required
+def notifications(request):
+    """The user's notifications, most recently active first."""
+    if request.method != "GET":
+        return JsonResponse({"error": "GET request required."}, status=400)
+
+    inbox = request.user.notifications.select_related("last_actor").order_by(
+        "-updated_at", "-id"
+    )
+    try:
+        page_obj = Paginator(inbox, 20).page(request.GET.get("page", 1))
+    except (EmptyPage, PageNotAnInteger):
+        return JsonResponse({"error": "Invalid page number."}, status=400)
+
+    return JsonResponse(
+        {
+            "data": [notification.serialize() for notification in page_obj],
+            "has_next": page_obj.has_next(),
+            "unread": unread_count(request.user),
+        }
+    )
+
+
+@login_required
+def unread_notifications(request):
+    """Badge count, read from the stored counter."""
+    if request.method != "GET":
+        return JsonResponse({"error": "GET request required."}, status=400)
+    return JsonResponse({"unread": unread_count(request.user)})
+
+
+@csrf_exempt
+@require_http_methods(["PUT"])
+@login_required
+def read_notifications(request):
+    """Marks the listed notification `ids` read, or all of them when omitted."""
+    try:
+        data = json.loads(request.body or "{}")
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "Invalid JSON."}, status=400)
+
+    ids = data.get("ids")
+    if ids is not None and not (
+        isinstance(ids, list) and all(isinstance(item, int) for item in ids)
+    ):
+        return JsonResponse({"error": "'ids' must be a list of integers."}, status=400)
+
+    marked = mark_read(request.user, ids)
+    return JsonResponse({"marked": marked, "unread": unread_count(request.user)})
+
+
+def requested_fields(request, allowed, param="fields"):
+    """Parses a comma-separated sparse fieldset; None means every field."""
+    raw = request.GET.get(param)
+    if not raw:
+        return None
+    fields = {name.strip() for name in raw.split(",") if name.strip()}
+    unknown = fields.difference(allowed)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}.")
+    return fields
+
+
 def paginated_response(request, queryset):
-    serialized = [item.serialize(current_user=request.user) for item in queryset]
+    try:
+        fields = requested_fields(request, Posts.SERIALIZED_FIELDS)
+    except ValueError as error:
+        return {"error": str(error), "status": 400}
+
     page_number = request.GET.get("page", 1)
-    paginator = Paginator(serialized, 10)
+    paginator = Paginator(queryset, 10)
 
     try:
         page_obj = paginator.page(page_number)
     except:
         return {"error": "Invalid page number.", "status": 400}
 
+    items = Posts.prepare_page(page_obj.object_list, request.user, fields)
     return {
-        "data": page_obj.object_list,
+        "data": [
+            item.serialize(current_user=request.user, fields=fields) for item in items
+        ],
         "has_next": page_obj.has_next(),
         "has_previous": page_obj.has_previous(),
         "num_pages": paginator.num_pages,
@@ -192,18 +318,148 @@ def paginated_response(request, queryset):
     }
 
 
+def encode_cursor(item):
+    raw = f"{item.timestamp.isoformat()}|{item.id}"
+    return urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    timestamp, item_id = urlsafe_b64decode(cursor.encode()).decode().split("|")
+    return datetime.fromisoformat(timestamp), int(item_id)
+
+
+def cursor_paginated_response(request, queryset, id_field="id", page_size=10):
+    """Keyset pagination on (timestamp, id), newest first.
+
+    Each page is a range read that continues after the `cursor` of the previous
+    one, so deep pages cost the same as the first. `queryset` may also be an
+    index table (tags, mentions) whose rows carry `timestamp` and the post id in
+    `id_field`; its rows are resolved to posts by primary key.
+    """
+    try:
+        fields = requested_fields(request, Posts.SERIALIZED_FIELDS)
+    except ValueError as error:
+        return {"error": str(error), "status": 400}
+
+    queryset = queryset.order_by("-timestamp", f"-{id_field}")
+    cursor = request.GET.get("cursor")
+    if cursor:
+        try:
+            timestamp, item_id = decode_cursor(cursor)
+        except (ValueError, UnicodeDecodeError, binascii.Error):
+            return {"error": "Invalid cursor.", "status": 400}
+        queryset = queryset.filter(
+            Q(timestamp__lt=timestamp)
+            | Q(timestamp=timestamp, **{f"{id_field}__lt": item_id})
+        )
+
+    rows = list(queryset[: page_size + 1])
+    has_next = len(rows) > page_size
+    rows = rows[:page_size]
+    if id_field == "id":
+        items = rows
+    else:
+        ids = [getattr(row, id_field) for row in rows]
+        posts = find_posts(ids)
+        items = [posts[post_id] for post_id in ids if post_id in posts]
+
+    items = Posts.prepare_page(items, request.user, fields)
+    return {
+        "data": [
+            item.serialize(current_user=request.user, fields=fields) for item in items
+        ],
+        "has_next": has_next,
+        "next_cursor": encode_cursor(items[-1]) if has_next else None,
+    }
+
+
+def comments(request, post_id):
+    """Full comment list of a post, newest first, paged by cursor."""
+    if request.method != "GET":
+        return JsonResponse({"error": "GET request required."}, status=400)
+
+    try:
+        parent = find_post(post_id, Posts.objects.only("id"))
+    except Posts.DoesNotExist:
+        return JsonResponse({"error": "Post cannot be found."}, status=400)
+
+    result = cursor_paginated_response(
+        request,
+        Posts.objects.using(parent._state.db)
+        .filter(parent_id=post_id)
+        .select_related("user"),
+    )
+    status = result.pop("status", 200)
+    return JsonResponse(result, status=status)
+
+
+def thread(request, post_id):
+    """Nested replies under a post, limited to `depth` levels."""
+    if request.method != "GET":
+        return JsonResponse({"error": "GET request required."}, status=400)
+
+    try:
+        social_post = find_post(post_id)
+    except Posts.DoesNotExist:
+        return JsonResponse({"error": "Post cannot be found."}, status=400)
+
+    try:
+        depth = min(max(int(request.GET.get("depth", 3)), 1), MAX_THREAD_DEPTH)
+    except ValueError:
+        return JsonResponse({"error": "Invalid depth."}, status=400)
+
+    return JsonResponse({"id": social_post.id, "replies": social_post.reply_tree(depth)})
+
+
 def handle_all(request):
-    result = paginated_response(request, Posts.objects.all())
+    result = paginated_response(request, sharded(Posts.objects.all()))
     result.update({"page_name": "Public Feed"})
     status = result.pop("status", 200)
     return JsonResponse(result, status=status)
 
 
 def handle_following(request):
+    result = paginated_response(request, following_posts(request.user))
+    result.update({"page_name": "Following Feed"})
+    status = result.pop("status", 200)
+    return JsonResponse(result, status=status)
+
+
+def handle_trending(request):
     result = paginated_response(
-        request, Posts.objects.filter(user__in=request.user.following.all())
+        request,
+        sharded(
+            Posts.objects.filter(trending__isnull=False)
+            .select_related("user", "trending")
+            .order_by("-trending__score", "-id")
+        ),
     )
-    result.update({"page_name": "Following Feed"})
+    result.update({"page_name": "Trending"})
+    status = result.pop("status", 200)
+    return JsonResponse(result, status=status)
+
+
+def tag_feed(request, tag):
+    if request.method != "GET":
+        return JsonResponse({"error": "GET request required."}, status=400)
+
+    tag = tag.lower().lstrip("#")
+    result = cursor_paginated_response(
+        request, sharded(PostTag.objects.filter(tag=tag)), id_field="post_id"
+    )
+    result.update({"page_name": f"#{tag}"})
+    status = result.pop("status", 200)
+    return JsonResponse(result, status=status)
+
+
+@login_required
+def handle_mentions(request):
+    result = cursor_paginated_response(
+        request,
+        sharded(PostMention.objects.filter(user=request.user)),
+        id_field="post_id",
+    )
+    result.update({"page_name": "Mentions"})
     status = result.pop("status", 200)
     return JsonResponse(result, status=status)
 
@@ -214,17 +470,75 @@ def handle_profile(request, username=None):
             user = User.objects.get(username=username)
         except User.DoesNotExist:
             return JsonResponse({"error": "User not found"}, status=404)
+    elif not request.user.is_authenticated:
+        return JsonResponse({"error": "Login required."}, status=401)
     else:
         user = request.user
 
-    user_data = user.serialize()
-    result = paginated_response(request, Posts.objects.filter(user=user))
+    try:
+        profile_fields = requested_fields(
+            request, User.SERIALIZED_FIELDS, param="profile_fields"
+        )
+    except ValueError as error:
+        return JsonResponse({"error": str(error)}, status=400)
+
+    user_data = user.serialize(fields=profile_fields)
+    result = paginated_response(request, profile_posts(user))
     status = result.pop("status", 200)
     user_data.update(result)
     user_data.update({"page_name": f"{user.username}'s Profile"})
     return JsonResponse(user_data, status=status)
 
 
+def posts_newer_than(queryset, timestamp, newest_id):
+    """Posts after (timestamp, id), phrased as a range so it stays index-only."""
+    return (
+        queryset.filter(timestamp__gte=timestamp)
+        .exclude(timestamp=timestamp, id__lte=newest_id)
+        .order_by()
+    )
+
+
+def new_posts_since(request, page_name):
+    """Counts posts newer than the client's newest (timestamp, id) in a feed.
+
+    Only indexed columns are read, and results are cached for a few seconds
+    so many clients polling the same feed head share one query.
+    """
+    if request.method != "GET":
+        return JsonResponse({"error": "GET request required."}, status=400)
+
+    feeds = {
+        "all": lambda: sharded(Posts.objects.all()),
+        "following": lambda: following_posts(request.user),
+    }
+    feed = feeds.get(page_name)
+    if feed is None:
+        return JsonResponse({"error": "Page not found."}, status=404)
+    if page_name == "following" and not request.user.is_authenticated:
+        return JsonResponse({"error": "Login required."}, status=401)
+
+    try:
+        timestamp = datetime.fromisoformat(request.GET["timestamp"])
+        newest_id = int(request.GET["id"])
+    except (KeyError, ValueError):
+        return JsonResponse(
+            {"error": "ISO 'timestamp' and integer 'id' are required."}, status=400
+        )
+    if timezone.is_naive(timestamp):
+        timestamp = timezone.make_aware(timestamp, dt_timezone.utc)
+
+    owner = request.user.id if page_name == "following" else ""
+    key = f"network:since:{page_name}:{owner}:{timestamp.isoformat()}:{newest_id}"
+    result = cache.get(key)
+    if result is None:
+        result = posts_newer_than(feed(), timestamp, newest_id).aggregate(
+            count=Count("id"), max_id=Max("id")
+        )
+        cache.set(key, result, getattr(settings, "NEW_POSTS_CACHE_SECONDS", 5))
+    return JsonResponse(result)
+
+
 def page(request, page_name):
     if request.method != "GET":
         return JsonResponse({"error": "GET request required."}, status=400)
@@ -232,6 +546,9 @@ def page(request, page_name):
     handlers = {
         "all": handle_all,
         "following": handle_following,
+        "trending": handle_trending,
+        "mentions": handle_mentions,
+        "profile": handle_profile,
     }
 
     handler = handlers.get(page_name)
@@ -42,11 +42,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'network.middleware.SamplingProfilerMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'network.middleware.CompressionMiddleware',
+    'django.middleware.http.ConditionalGetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'network.middleware.NotificationBatchMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -82,8 +86,42 @@ DATABASES = {
     }
 }
 
+# Optional user sharding (see network/sharding.py). NETWORK_SHARD_COUNT=N adds
+# N SQLite databases that hold posts, likes and their index rows; run
+# `manage.py migrate --database shard_<i>` for each, then `manage.py rebalance_shards`.
+
+NETWORK_SHARDS = [
+    f"shard_{i}" for i in range(int(os.environ.get("NETWORK_SHARD_COUNT", "0")))
+]
+
+for alias in NETWORK_SHARDS:
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, f'db.{alias}.sqlite3'),
+    }
+
+DATABASE_ROUTERS = ["network.sharding.UserShardRouter"]
+
 AUTH_USER_MODEL = "network.User"
 
+AUTHENTICATION_BACKENDS = ["network.backends.CachedModelBackend"]
+
+
+# Sessions and caching
+# Signed-cookie sessions and a cached session user mean an authenticated API
+# request reaches the view without touching the session or user tables.
+
+SESSION_ENGINE = "django.contrib.sessions.backends.signed_cookies"
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }
+}
+
+# Seconds a session user stays cached; bounds staleness across processes
+USER_CACHE_TIMEOUT = 60
+
 # Password validation
 # https://docs.djangoproject.com/en/3.0/ref/settings/#auth-password-validators
 
@@ -121,3 +159,42 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/3.0/howto/static-files/
 
 STATIC_URL = '/static/'
+
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+
+# Fingerprinted names plus .gz/.br variants, written by collectstatic and
+# served with immutable caching by network.assets.serve_asset
+STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    "staticfiles": {
+        "BACKEND": "network.storage.CompressedManifestStaticFilesStorage",
+    },
+}
+
+
+# Trending feed (see network/trending.py)
+
+TRENDING_WINDOW_HOURS = 48
+TRENDING_GRAVITY = 1.5
+TRENDING_COMMENT_WEIGHT = 2.0
+TRENDING_LIMIT = 500
+
+# Number of newest comments inlined with each post in feed payloads
+COMMENT_PREVIEW_SIZE = 3
+
+# Seconds a "new posts since" count is shared between polling clients
+NEW_POSTS_CACHE_SECONDS = 5
+
+# Threads with no post newer than this move to the archive (manage.py archive_posts)
+ARCHIVE_AFTER_DAYS = 180
+
+# Request profiling (see network/profiling.py): profile 1 in PROFILE_SAMPLE_RATE
+# requests (0 disables sampling) and any request whose X-Profile-Token header
+# matches PROFILE_TOKEN. Captures are kept under PROFILE_DIR, oldest deleted
+# first once it exceeds PROFILE_MAX_BYTES.
+PROFILE_SAMPLE_RATE = int(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN", "")
+PROFILE_DIR = os.path.join(BASE_DIR, 'profiles')
+PROFILE_MAX_BYTES = 50 * 1024 * 1024
@@ -13,10 +13,14 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
-from django.urls import include, path
+from django.urls import include, path, re_path
+
+from network.assets import serve_asset
 
 urlpatterns = [
     path("admin/", admin.site.urls),
+    re_path(rf"^{settings.STATIC_URL.strip('/')}/(?P<path>.+)$", serve_asset),
     path("", include("network.urls")),
 ]